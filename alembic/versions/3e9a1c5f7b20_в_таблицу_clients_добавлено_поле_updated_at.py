@@ -0,0 +1,37 @@
+"""В таблицу clients добавлено поле updated_at
+
+Revision ID: 3e9a1c5f7b20
+Revises: 0b6f4c2d9e17
+Create Date: 2026-10-19 10:05:12.418230
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '3e9a1c5f7b20'
+down_revision: Union[str, None] = '0b6f4c2d9e17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'clients',
+        sa.Column(
+            'updated_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+    )
+    op.create_index('ix_clients_updated_at', 'clients', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clients_updated_at', table_name='clients')
+    op.drop_column('clients', 'updated_at')
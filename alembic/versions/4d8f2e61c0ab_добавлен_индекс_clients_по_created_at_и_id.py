@@ -0,0 +1,32 @@
+"""Добавлен индекс clients по created_at и id
+
+Revision ID: 4d8f2e61c0ab
+Revises: 9c4e1b7a2d53
+Create Date: 2026-10-18 11:03:17.224905
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '4d8f2e61c0ab'
+down_revision: Union[str, None] = '9c4e1b7a2d53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_clients_created_at_id',
+        'clients',
+        ['created_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clients_created_at_id', table_name='clients')
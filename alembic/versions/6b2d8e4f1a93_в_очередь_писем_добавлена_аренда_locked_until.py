@@ -0,0 +1,30 @@
+"""В очередь писем добавлена аренда locked_until
+
+Revision ID: 6b2d8e4f1a93
+Revises: 3e9a1c5f7b20
+Create Date: 2026-10-19 11:24:37.902615
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2d8e4f1a93'
+down_revision: Union[str, None] = '3e9a1c5f7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'email_outbox',
+        sa.Column('locked_until', sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('email_outbox', 'locked_until')
@@ -0,0 +1,32 @@
+"""Добавлен индекс по координатам clients
+
+Revision ID: 9c4e1b7a2d53
+Revises: 2a3e82180d4c
+Create Date: 2026-10-18 10:12:41.508311
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e1b7a2d53'
+down_revision: Union[str, None] = '2a3e82180d4c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_clients_latitude_longitude',
+        'clients',
+        ['latitude', 'longitude'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clients_latitude_longitude', table_name='clients')
@@ -0,0 +1,44 @@
+"""Добавлены trigram индексы имени и фамилии
+
+Revision ID: b7e3a90f14d2
+Revises: 4d8f2e61c0ab
+Create Date: 2026-10-18 11:48:02.913570
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3a90f14d2'
+down_revision: Union[str, None] = '4d8f2e61c0ab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in ('first_name', 'last_name'):
+        op.create_index(
+            f'ix_clients_{column}_trgm',
+            'clients',
+            [column],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+        op.create_index(
+            f'ix_clients_{column}_lower_pattern',
+            'clients',
+            [sa.text(f'lower({column}) text_pattern_ops')],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    for column in ('first_name', 'last_name'):
+        op.drop_index(f'ix_clients_{column}_lower_pattern', table_name='clients')
+        op.drop_index(f'ix_clients_{column}_trgm', table_name='clients')
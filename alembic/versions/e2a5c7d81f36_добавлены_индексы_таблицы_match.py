@@ -0,0 +1,39 @@
+"""Добавлены индексы таблицы match
+
+Revision ID: e2a5c7d81f36
+Revises: b7e3a90f14d2
+Create Date: 2026-10-18 13:21:54.671208
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a5c7d81f36'
+down_revision: Union[str, None] = 'b7e3a90f14d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_match_client_id_created_at',
+        'match',
+        ['client_id', 'created_at'],
+        unique=False,
+    )
+    op.create_index(
+        'ix_match_target_id_client_id',
+        'match',
+        ['target_id', 'client_id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_match_target_id_client_id', table_name='match')
+    op.drop_index('ix_match_client_id_created_at', table_name='match')
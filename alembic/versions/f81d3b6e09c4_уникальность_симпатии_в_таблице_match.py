@@ -0,0 +1,36 @@
+"""Уникальность симпатии в таблице match
+
+Revision ID: f81d3b6e09c4
+Revises: e2a5c7d81f36
+Create Date: 2026-10-18 14:02:36.118734
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'f81d3b6e09c4'
+down_revision: Union[str, None] = 'e2a5c7d81f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # оставляем самую раннюю из повторных симпатий
+    op.execute(
+        'DELETE FROM match AS duplicate USING match AS original '
+        'WHERE duplicate.client_id = original.client_id '
+        'AND duplicate.target_id = original.target_id '
+        'AND duplicate.id > original.id'
+    )
+    op.create_unique_constraint(
+        'uq_match_client_id_target_id', 'match', ['client_id', 'target_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_match_client_id_target_id', 'match', type_='unique')
@@ -1,25 +1,60 @@
 from datetime import datetime
-from typing import Sequence
+from typing import Literal
 
-from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.middlwares.rate_limit import rate_limit
+from app.core.config import settings
 from app.db.session import get_session
-from app.schemas.auth import Token, UserAuth
-from app.schemas.client import Client, ClientCreate
+from app.schemas.auth import Principal, Token, UserAuth
+from app.schemas.client import Client, ClientCreate, ClientFilters, ClientPage
+from app.schemas.match import MatchBatch, MatchBatchResult
 from app.services.auth import auth_user_f, refresh_access_token
 from app.services.client import (
     create_client_f,
+    export_clients_f,
     get_clients_f,
-    get_current_user,
+    get_current_principal,
     match_client_f,
+    match_clients_batch_f,
 )
+from app.services.ratings import charge_ratings
 
 router = APIRouter()
 
 
+def client_filters(
+    gender: str | None = Query(None, description="Фильтр по полу"),
+    first_name: str | None = Query(None, description="Фильтр по имени"),
+    last_name: str | None = Query(None, description="Фильтр по фамилии"),
+    distance: float | None = Query(None, description="Фильтр по расстоянию (км)"),
+    created_at: datetime | None = Query(None, description="Фильтр по дате регистрации"),
+    name_match: Literal["contains", "prefix"] = Query(
+        "contains", description="Поиск имени и фамилии по подстроке или по началу"
+    ),
+    created_after: datetime | None = Query(
+        None, description="Зарегистрированы не раньше указанного момента"
+    ),
+    created_before: datetime | None = Query(
+        None, description="Зарегистрированы раньше указанного момента"
+    ),
+) -> ClientFilters:
+    """Фильтры списка участников из параметров запроса"""
+    return ClientFilters(
+        gender=gender,
+        first_name=first_name,
+        last_name=last_name,
+        name_match=name_match,
+        distance=distance,
+        created_at=created_at,
+        created_after=created_after,
+        created_before=created_before,
+    )
+
+
 @router.post("/api/clients/create", response_model=Client, status_code=201)
 async def create_client(
     request: Request,
@@ -45,6 +80,22 @@ async def logout_user():
     return {'message': 'Пользователь успешно вышел из системы'}
 
 
+@router.post(
+    "/api/clients/match/batch",
+    response_model=MatchBatchResult,
+    dependencies=[Depends(HTTPBearer())],
+)
+async def match_clients_batch(
+    batch: MatchBatch,
+    current_user: Principal = Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    """Endpoint пакетного оценивания участником других участников"""
+    target_client_ids = list(dict.fromkeys(batch.target_ids))
+    await charge_ratings(current_user, session, len(target_client_ids))
+    return await match_clients_batch_f(target_client_ids, current_user, session)
+
+
 @router.post(
     "/api/clients/{target_client_id}/match",
     response_model=dict,
@@ -52,37 +103,49 @@ async def logout_user():
 )
 async def match_client(
     target_client_id: int,
-    background_tasks: BackgroundTasks,
-    current_user: Client = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
     rate_limit: None = Depends(rate_limit),
 ):
     """Endpoint оценивания участником другого участника"""
-    return await match_client_f(
-        target_client_id, background_tasks, current_user, session
-    )
+    return await match_client_f(target_client_id, current_user, session)
 
 
 @router.get(
-    "/api/list", response_model=Sequence[Client], dependencies=[Depends(HTTPBearer())]
+    "/api/list", response_model=ClientPage, dependencies=[Depends(HTTPBearer())]
 )
 async def get_clients(
     session: AsyncSession = Depends(get_session),
-    current_user: Client = Depends(get_current_user),
-    gender: str | None = Query(None, description="Фильтр по полу"),
-    first_name: str | None = Query(None, description="Фильтр по имени"),
-    last_name: str | None = Query(None, description="Фильтр по фамилии"),
-    distance: float | None = Query(None, description="Фильтр по расстоянию (км)"),
-    created_at: datetime | None = Query(None, description="Фильтр по дате регистрации"),
+    current_user: Principal = Depends(get_current_principal),
+    filters: ClientFilters = Depends(client_filters),
+    limit: int | None = Query(
+        None,
+        ge=1,
+        le=settings.CLIENTS_PAGE_SIZE_MAX,
+        description="Размер страницы",
+    ),
+    cursor: str | None = Query(None, description="Курсор следующей страницы"),
 ):
     """Endpoint для получения списка участников"""
-    return await get_clients_f(
-        session, current_user, gender, first_name, last_name, distance, created_at
-    )
+    return await get_clients_f(session, current_user, filters, limit, cursor)
+
+
+@router.get("/api/list/export", dependencies=[Depends(HTTPBearer())])
+async def export_clients(
+    session: AsyncSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_principal),
+    filters: ClientFilters = Depends(client_filters),
+):
+    """Endpoint для потоковой выгрузки участников в формате NDJSON"""
+    content = await export_clients_f(session, current_user, filters)
+    return StreamingResponse(content, media_type="application/x-ndjson")
+
 
 @router.post("/api/token/refresh")
-def refresh_token_endpoint(refresh_token: str):
+async def refresh_token_endpoint(
+    refresh_token: str, session: AsyncSession = Depends(get_session)
+):
     """
     Эндпоинт для обновления access токена с использованием refresh токена.
     """
-    return refresh_access_token(refresh_token)
+    return await refresh_access_token(refresh_token, session)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+
+from app.core.cache import clients_cache, clients_generations, users_cache
+from app.core.security import password_pool, token_cache
+from app.db.session import pool_stats
+from app.services.geolocation import geolocation
+from app.services.storage import image_pool
+
+router = APIRouter()
+
+
+@router.get("/api/metrics")
+async def get_metrics():
+    """Endpoint для получения счетчиков работы приложения в текущем процессе"""
+    return {
+        "clients_cache": clients_cache.stats(),
+        "clients_generations": clients_generations.stats(),
+        "users_cache": users_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "db_pool": pool_stats(),
+        "image_pool": image_pool.stats(),
+        "geolocation": geolocation.stats(),
+    }
@@ -5,7 +5,7 @@ from app.services.storage import save_avatar_image
 router = APIRouter()
 
 
-@router.post("/api/storage/upload", status_code=200)
+@router.post("/api/storage/upload", status_code=200, response_model=dict[str, str])
 async def upload_image(avatar: UploadFile = File):
-    """Endpoint для загрузки аватара"""
+    """Endpoint для загрузки аватара, возвращает адреса вариантов разного размера"""
     return await save_avatar_image(avatar)
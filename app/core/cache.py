@@ -0,0 +1,293 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlparse
+
+from aiocache import Cache
+from aiocache.serializers import JsonSerializer
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def redis_options(url: str) -> dict:
+    """Преобразует адрес Redis вида redis://:password@host:port/db в параметры"""
+    parsed = urlparse(url)
+    return {
+        "endpoint": parsed.hostname or "localhost",
+        "port": parsed.port or 6379,
+        "db": int(parsed.path.lstrip("/") or 0),
+        "password": parsed.password,
+    }
+
+
+def create_cache(namespace: str) -> Cache:
+    """Создает кэш с выбранным в настройках бэкендом и сериализацией в JSON"""
+    if settings.CACHE_BACKEND == "memory":
+        return Cache(Cache.MEMORY, namespace=namespace, serializer=JsonSerializer())
+    return Cache(
+        Cache.REDIS,
+        namespace=namespace,
+        serializer=JsonSerializer(),
+        **redis_options(settings.REDIS_URL),
+    )
+
+
+class LocalCache:
+    """LRU-кэш в памяти процесса с ограничением размера и временем жизни записей"""
+
+    MISSING = object()
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.evictions = 0
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Any:
+        """Возвращает значение по ключу или LocalCache.MISSING"""
+        item = self._data.get(key)
+        if item is None:
+            return self.MISSING
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return self.MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Сохраняет значение, вытесняя давно не использованные записи"""
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+
+class LoadCancelled(Exception):
+    """Загрузка значения отменена вместе с запросом, который ее выполнял"""
+
+
+class TieredCache:
+    """
+    Двухуровневый кэш: LRU в памяти процесса перед общим кэшем (Redis).
+    Одновременные промахи по одному ключу в процессе объединяются,
+    и значение загружается из общего кэша или источника один раз.
+    При ошибке общего кэша значение загружается из источника
+    """
+
+    def __init__(self, shared: Cache, local: LocalCache, local_ttl: float):
+        self.shared = shared
+        self.local = local
+        self.local_ttl = local_ttl
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        local_ttl: float | None = None,
+    ) -> Any:
+        """
+        Возвращает значение по ключу, при промахе в обоих уровнях вызывает loader.
+        Значение должно сериализоваться в JSON, None не кэшируется.
+        Если запрос, загружавший значение, отменен, ожидающие запросы
+        повторяют загрузку сами
+        """
+        while True:
+            value = self.local.get(key)
+            if value is not LocalCache.MISSING:
+                self.local_hits += 1
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                return await self._load(key, loader, ttl, local_ttl)
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except LoadCancelled:
+                continue
+
+    async def _load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float,
+        local_ttl: float | None,
+    ) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._shared_get(key)
+            if value is not None:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+                value = await loader()
+                if value is not None:
+                    await self._shared_set(key, value, ttl)
+            if value is not None:
+                self.local.set(key, value, min(ttl, local_ttl or self.local_ttl))
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.set_exception(LoadCancelled())
+            future.exception()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # исключение получат ожидающие запросы,
+            # если их нет - не выводим предупреждение
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _shared_get(self, key: str) -> Any:
+        try:
+            return await self.shared.get(key)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("Общий кэш недоступен, чтение %s: %s", key, exc)
+            return None
+
+    async def _shared_set(self, key: str, value: Any, ttl: float) -> None:
+        try:
+            await self.shared.set(key, value, ttl=ttl)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("Общий кэш недоступен, запись %s: %s", key, exc)
+
+    async def delete(self, key: str) -> None:
+        """
+        Удаляет значение из обоих уровней. Ошибка общего кэша только логируется:
+        изменения к этому моменту уже сохранены, а запись устареет по TTL
+        """
+        self.local.delete(key)
+        try:
+            await self.shared.delete(key)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("Не удалось удалить %s из общего кэша: %s", key, exc)
+
+    def stats(self) -> dict:
+        total = self.local_hits + self.shared_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": (self.local_hits + self.shared_hits) / total if total else 0.0,
+            "local_size": len(self.local),
+            "local_max_size": self.local.max_size,
+            "local_evictions": self.local.evictions,
+        }
+
+
+class CacheGenerations:
+    """
+    Поколения групп закэшированных данных.
+    Номер поколения каждой группы, от которой зависит результат, входит в ключ кэша,
+    поэтому увеличение номера делает недействительными все записи группы сразу
+    и одинаково работает для кэша в памяти и для Redis.
+    Номера хранятся и в памяти процесса в течение local_ttl секунд, чтобы чтение
+    страницы из локального кэша не требовало обращения к Redis. Поэтому другие
+    процессы видят сброс поколения с задержкой до local_ttl
+    """
+
+    def __init__(self, cache: Cache, local: LocalCache, local_ttl: float):
+        self.cache = cache
+        self.local = local
+        self.local_ttl = local_ttl
+        self.errors = 0
+
+    async def get(self, groups: list[str]) -> list[int]:
+        """Возвращает текущие номера поколений групп"""
+        generations = {group: self.local.get(group) for group in groups}
+        missing = [
+            group for group, value in generations.items() if value is LocalCache.MISSING
+        ]
+        if missing:
+            try:
+                values = await self.cache.multi_get(
+                    missing,
+                    loads_fn=lambda value: int(value) if value is not None else 0,
+                )
+            except Exception as exc:
+                self.errors += 1
+                logger.warning("Не удалось прочитать поколения %s: %s", missing, exc)
+                values = [0] * len(missing)
+            else:
+                for group, value in zip(missing, values):
+                    self.local.set(group, value, self.local_ttl)
+            generations.update(zip(missing, values))
+        return [generations[group] for group in groups]
+
+    async def bump(self, groups: list[str]) -> None:
+        """
+        Увеличивает номера поколений групп. Сброс выполняется после сохранения
+        изменений, поэтому ошибка кэша только логируется, а записи групп
+        устареют по TTL
+        """
+        for group in groups:
+            self.local.delete(group)
+        try:
+            for group in groups:
+                await self.cache.increment(group)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("Не удалось сбросить поколения групп %s: %s", groups, exc)
+
+    def stats(self) -> dict:
+        return {"errors": self.errors, "local_size": len(self.local)}
+
+
+def build_key(prefix: str, **params) -> str:
+    """Строит ключ кэша из префикса и значений параметров, пустые значения опускаются"""
+    payload = json.dumps(
+        {name: value for name, value in params.items() if value is not None},
+        sort_keys=True,
+        default=str,
+    )
+    return f"{prefix}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+clients_cache = TieredCache(
+    create_cache("clients"),
+    LocalCache(settings.LOCAL_CACHE_MAX_SIZE),
+    local_ttl=settings.CLIENTS_CACHE_TTL,
+)
+clients_generations = CacheGenerations(
+    create_cache("clients_generations"),
+    LocalCache(settings.LOCAL_CACHE_MAX_SIZE),
+    local_ttl=settings.CACHE_GENERATIONS_LOCAL_TTL,
+)
+users_cache = TieredCache(
+    create_cache("users"),
+    LocalCache(settings.LOCAL_CACHE_MAX_SIZE),
+    local_ttl=settings.LOCAL_CACHE_TTL,
+)
+geo_cache = TieredCache(
+    create_cache("geo"),
+    LocalCache(settings.LOCAL_CACHE_MAX_SIZE),
+    local_ttl=settings.GEOLOCATION_CACHE_TTL,
+)
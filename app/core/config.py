@@ -1,4 +1,5 @@
 from dotenv import load_dotenv
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
 load_dotenv()
@@ -11,7 +12,25 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
     POSTGRES_HOST: str
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_PGBOUNCER: bool = False
     PATH_TO_AVATAR_WATERMARK: str
+    IMAGE_WORKERS: int = 2
+    IMAGE_QUEUE_LIMIT: int = 8
+    WATERMARK_CACHE_SIZE: int = 64
+    AVATAR_MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024
+    AVATAR_MAX_DIMENSION: int = 2048
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    KEEP_ORIGINAL_AVATARS: bool = False
+    AVATAR_RENDITIONS: dict[str, int] = {"thumb": 128, "medium": 512, "full": 2048}
+    AVATAR_FORMAT: str = "WEBP"
+    AVATAR_QUALITY: int = 85
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
@@ -24,9 +43,52 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS: bool = False
     USE_CREDENTIALS: bool
     VALIDATE_CERTS: bool
+    SMTP_TIMEOUT: int = 30
+    SMTP_IDLE_TIMEOUT: int = 60
+    EMAIL_BATCH_SIZE: int = 50
+    EMAIL_POLL_INTERVAL: float = 2.0
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_DELAY: int = 30
+    EMAIL_LEASE_SECONDS: int = 300
     RATINGS_PER_DAY: int
+    RATE_LIMIT_BACKEND: str = "redis"
+    MATCH_BATCH_MAX_SIZE: int = 100
     REFRESH_SECRET_KEY: str
     REFRESH_TOKEN_EXPIRE_MINUTES: int
+    GEO_BACKEND: str = "database"
+    GEO_INDEX_SYNC_OVERLAP: int = 300
+    CLIENTS_PAGE_SIZE: int = 50
+    CLIENTS_PAGE_SIZE_MAX: int = 500
+    CLIENTS_EXPORT_CHUNK_SIZE: int = 1000
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_BACKEND: str = "redis"
+    CLIENTS_CACHE_TTL: int = 600
+    CACHE_GEO_GROUP_DEGREES: float = 1.0
+    LOCAL_CACHE_MAX_SIZE: int = 1024
+    LOCAL_CACHE_TTL: int = 10
+    CACHE_GENERATIONS_LOCAL_TTL: float = 1.0
+    USER_CACHE_TTL: int = 60
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    TOKEN_CACHE_TTL: int = 300
+    PASSWORD_WORKERS: int = 4
+    PASSWORD_QUEUE_LIMIT: int = 64
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    GEOLOCATION_BACKEND: str = "local"
+    GEOLOCATION_MODE: str = "sync"
+    GEOLOCATION_URL: str = "http://ip-api.com/json/{ip}"
+    GEOLOCATION_TIMEOUT: float = 2.0
+    GEOLOCATION_MAX_CONNECTIONS: int = 10
+    GEOLOCATION_CACHE_TTL: int = 86400
+    GEOLOCATION_DB_PATH: str = "geoip.bin"
+
+    @field_validator("AVATAR_FORMAT")
+    @classmethod
+    def check_avatar_format(cls, value: str) -> str:
+        """Приводит формат аватаров к названию формата в Pillow"""
+        value = value.upper()
+        if value not in ("WEBP", "JPEG"):
+            raise ValueError("AVATAR_FORMAT должен быть WEBP или JPEG")
+        return value
 
     @property
     def db_url(self):
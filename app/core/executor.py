@@ -0,0 +1,98 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+
+from fastapi import HTTPException, status
+
+
+def timed_call(func, *args) -> tuple:
+    """Выполняет func в потоке или процессе пула и возвращает результат и время"""
+    started_at = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started_at
+
+
+class BoundedExecutor:
+    """
+    Пул потоков или процессов для вычислений вне event loop.
+    Число задач в работе и в очереди ограничено, при переполнении
+    запрос отклоняется с ошибкой 503. Пул создается при первой задаче.
+    Счетчики обновляются только в event loop: время выполнения замеряется
+    в пуле и возвращается вместе с результатом, время ожидания - это
+    остаток общего времени задачи
+    """
+
+    def __init__(
+        self,
+        executor_class: type[Executor],
+        max_workers: int,
+        max_pending: int,
+        overload_detail: str = "Сервер перегружен. Попробуйте позже.",
+        **executor_options,
+    ):
+        self.executor_class = executor_class
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.overload_detail = overload_detail
+        self.executor_options = executor_options
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self._executor: Executor | None = None
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=self.overload_detail,
+                headers={"Retry-After": "1"},
+            )
+        if self._executor is None:
+            self._executor = self.executor_class(
+                max_workers=self.max_workers, **self.executor_options
+            )
+
+        self.pending += 1
+        submitted_at = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, run_time = await loop.run_in_executor(
+                self._executor, timed_call, func, *args
+            )
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        wait = max(time.perf_counter() - submitted_at - run_time, 0.0)
+        self.completed += 1
+        self.run_total += run_time
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        running = min(self.pending, self.max_workers)
+        return {
+            "workers": self.max_workers,
+            "running": running,
+            "queued": self.pending - running,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_avg": self.wait_total / self.completed if self.completed else 0.0,
+            "wait_max": self.wait_max,
+            "run_avg": self.run_total / self.completed if self.completed else 0.0,
+        }
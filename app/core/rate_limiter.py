@@ -0,0 +1,154 @@
+import logging
+import math
+import time
+import uuid
+from collections import deque
+from typing import NamedTuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Скользящее окно: журнал попыток в sorted set, score - время попытки в мс.
+# Возвращает {1, 0}, если попытка разрешена, или {0, retry_after_ms}
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local member = ARGV[5]
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+if count + cost > limit then
+    if cost > limit then
+        return {0, window}
+    end
+    local index = count + cost - limit - 1
+    local freed = redis.call('ZRANGE', key, index, index, 'WITHSCORES')
+    return {0, tonumber(freed[2]) + window - now}
+end
+for i = 1, cost do
+    redis.call('ZADD', key, now, member .. ':' .. i)
+end
+redis.call('PEXPIRE', key, window)
+return {1, 0}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    retry_after: int
+
+
+class MemoryRateLimiter:
+    """
+    Ограничитель частоты со скользящим окном в памяти процесса.
+    Для каждой попытки хранится момент, когда она выйдет из окна,
+    ключи без попыток в окне удаляются, а раз в sweep_interval секунд
+    удаляются и ключи, по которым больше не было обращений
+    """
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self._hits: dict[str, deque[float]] = {}
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+
+    def _sweep(self, now: float) -> None:
+        expired = [key for key, hits in self._hits.items() if hits[-1] <= now]
+        for key in expired:
+            del self._hits[key]
+        self._next_sweep = now + self.sweep_interval
+
+    async def hit(
+        self, key: str, limit: int, window: int, cost: int = 1
+    ) -> RateLimitResult:
+        """
+        Регистрирует cost попыток по ключу, если за последние window секунд
+        их будет не больше limit, иначе возвращает время до освобождения места
+        """
+        now = time.time()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        hits = self._hits.get(key, deque())
+        while hits and hits[0] <= now:
+            hits.popleft()
+        if len(hits) + cost > limit:
+            if not hits:
+                self._hits.pop(key, None)
+            if cost > limit:
+                return RateLimitResult(False, window)
+            freed = hits[len(hits) + cost - limit - 1]
+            return RateLimitResult(False, max(math.ceil(freed - now), 1))
+        hits.extend([now + window] * cost)
+        self._hits[key] = hits
+        return RateLimitResult(True, 0)
+
+    async def refund(self, key: str, cost: int) -> None:
+        """Возвращает cost последних зарегистрированных попыток по ключу"""
+        hits = self._hits.get(key)
+        if not hits:
+            return
+        for _ in range(min(cost, len(hits))):
+            hits.pop()
+        if not hits:
+            del self._hits[key]
+
+
+class RedisRateLimiter:
+    """
+    Ограничитель частоты со скользящим окном в Redis, общий для всех процессов.
+    Проверка и запись выполняются атомарно одним Lua-скриптом,
+    при недоступности Redis используется ограничитель в памяти процесса
+    """
+
+    def __init__(self, url: str):
+        self.redis = Redis.from_url(url)
+        self.script = self.redis.register_script(SLIDING_WINDOW_SCRIPT)
+        self.fallback = MemoryRateLimiter()
+
+    async def hit(
+        self, key: str, limit: int, window: int, cost: int = 1
+    ) -> RateLimitResult:
+        """
+        Регистрирует cost попыток по ключу, если за последние window секунд
+        их будет не больше limit, иначе возвращает время до освобождения места
+        """
+        try:
+            allowed, retry_after_ms = await self.script(
+                keys=[f"rate_limit:{key}"],
+                args=[
+                    int(time.time() * 1000),
+                    window * 1000,
+                    limit,
+                    cost,
+                    uuid.uuid4().hex,
+                ],
+            )
+        except RedisError:
+            logger.warning("Redis недоступен, используется ограничитель в памяти")
+            return await self.fallback.hit(key, limit, window, cost)
+        return RateLimitResult(
+            bool(allowed), max(math.ceil(int(retry_after_ms) / 1000), 0)
+        )
+
+    async def refund(self, key: str, cost: int) -> None:
+        """Возвращает cost последних зарегистрированных попыток по ключу"""
+        try:
+            await self.redis.zpopmax(f"rate_limit:{key}", cost)
+        except RedisError:
+            await self.fallback.refund(key, cost)
+
+
+def create_rate_limiter() -> MemoryRateLimiter | RedisRateLimiter:
+    """Создает ограничитель частоты с выбранным в настройках бэкендом"""
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryRateLimiter()
+    return RedisRateLimiter(settings.REDIS_URL)
+
+
+rate_limiter = create_rate_limiter()
@@ -0,0 +1,112 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import jwt
+from passlib.context import CryptContext
+
+from app.core.cache import LocalCache
+from app.core.config import settings
+from app.core.executor import BoundedExecutor
+
+
+class TokenCache:
+    """
+    Кэш payload токенов, подпись которых уже проверена.
+    Ключом служит хэш токена вместе с ключом подписи, запись живет
+    не дольше срока действия токена
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.local = LocalCache(max_size)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, token: str, secret_key: str) -> dict:
+        """
+        Проверяет подпись и срок действия токена и возвращает его payload.
+        Выбрасывает jwt.ExpiredSignatureError и jwt.InvalidTokenError
+        """
+        key = hashlib.sha256(f"{secret_key}.{token}".encode()).hexdigest()
+        payload = self.local.get(key)
+        if payload is not LocalCache.MISSING:
+            if payload["exp"] <= time.time():
+                self.local.delete(key)
+                raise jwt.ExpiredSignatureError("Signature has expired")
+            self.hits += 1
+            return payload
+
+        self.misses += 1
+        payload = jwt.decode(
+            token,
+            secret_key,
+            algorithms=[settings.ALGORITHM],
+            options={"require": ["exp"]},
+        )
+        ttl = min(self.ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            self.local.set(key, payload, ttl)
+        return payload
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "size": len(self.local),
+            "max_size": self.local.max_size,
+            "evictions": self.local.evictions,
+        }
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_MAX_SIZE, settings.TOKEN_CACHE_TTL)
+
+
+def decode_token(token: str, secret_key: str) -> dict:
+    """Декодирует JWT токен с проверкой подписи, используя кэш проверенных токенов"""
+    return token_cache.decode(token, secret_key)
+
+
+# bcrypt отпускает GIL, поэтому хэширование в пуле потоков идет параллельно
+# event loop, но не больше PASSWORD_WORKERS одновременно
+password_pool = BoundedExecutor(
+    ThreadPoolExecutor,
+    settings.PASSWORD_WORKERS,
+    settings.PASSWORD_QUEUE_LIMIT,
+    thread_name_prefix="password",
+)
+
+
+async def run_password_task(func, *args):
+    """Выполняет хэширование или проверку пароля в пуле потоков для паролей"""
+    return await password_pool.run(func, *args)
+
+
+# Хэши с другим числом раундов считаются устаревшими и пересчитываются при логине
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__min_desired_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    bcrypt__max_desired_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
+
+
+async def hash_password(password: str) -> str:
+    """Хэширует пароль с текущими параметрами в пуле потоков для паролей"""
+    return await run_password_task(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Проверяет, совпадает ли введенный пароль с хешем в базе данных.
+    Проверка выполняется в пуле потоков для паролей, чтобы не блокировать event loop.
+    """
+    return await run_password_task(pwd_context.verify, plain_password, hashed_password)
+
+
+def password_needs_update(hashed_password: str) -> bool:
+    """Проверяет, получен ли хэш с устаревшими параметрами"""
+    return pwd_context.needs_update(hashed_password)
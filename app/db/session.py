@@ -1,8 +1,83 @@
+import time
+from uuid import uuid4
+
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
 
-engine = create_async_engine(settings.db_url, echo=True)
+
+class PoolMetrics:
+    """Счетчики выдачи соединений из пула: число, время ожидания и таймауты"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def stats(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg": self.wait_total / self.checkouts if self.checkouts else 0.0,
+            "wait_max": self.wait_max,
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который замеряет время получения соединения.
+    Время включает ожидание свободного соединения, открытие нового
+    и pre-ping, поэтому рост wait_max показывает нехватку соединений в пуле
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        pool_metrics.observe(time.perf_counter() - started)
+        return connection
+
+
+def connect_args() -> dict:
+    """
+    Параметры подключения asyncpg. За pgbouncer в режиме transaction
+    соединение с сервером меняется между транзакциями, поэтому кэши
+    подготовленных выражений отключаются, а выражения получают уникальные имена
+    """
+    if settings.DB_PGBOUNCER:
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+
+
+engine = create_async_engine(
+    settings.db_url,
+    echo=settings.DB_ECHO,
+    poolclass=TimedAsyncQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args=connect_args(),
+)
 
 async_session = async_sessionmaker(
     bind=engine,
@@ -11,6 +86,18 @@ async_session = async_sessionmaker(
 )
 
 
+def pool_stats() -> dict:
+    """Состояние пула соединений и счетчики ожидания соединений"""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        **pool_metrics.stats(),
+    }
+
+
 async def get_session() -> AsyncSession:
     async with async_session() as session:
         yield session
@@ -0,0 +1,186 @@
+import math
+from datetime import datetime
+from typing import Iterable
+
+import numpy as np
+
+from app.utils import EARTH_RADIUS_KM, bounding_box
+
+
+class _Bucket:
+    """Растущий массив позиций точек, попавших в одну ячейку сетки"""
+
+    __slots__ = ("positions", "size")
+
+    def __init__(self):
+        self.positions = np.empty(16, dtype=np.int64)
+        self.size = 0
+
+    def append(self, position: int) -> None:
+        if self.size == len(self.positions):
+            self.positions = np.resize(self.positions, self.size * 2)
+        self.positions[self.size] = position
+        self.size += 1
+
+    def view(self) -> np.ndarray:
+        return self.positions[: self.size]
+
+
+class GeoIndex:
+    """
+    Индекс координат клиентов в памяти процесса.
+    Координаты хранятся в массивах NumPy, точки разложены по ячейкам сетки
+    размером cell_size градусов, поэтому запрос по радиусу считает расстояние
+    только для точек из ячеек, пересекающих окрестность, и делает это векторно.
+    Клиент хранится в индексе один раз: при изменении координат старая точка
+    помечается удаленной (координаты NaN), удаленные точки периодически вычищаются
+    """
+
+    def __init__(self, cell_size: float = 1.0):
+        self.cell_size = cell_size
+        self.synced_at: datetime | None = None
+        self._ids = np.empty(1024, dtype=np.int64)
+        self._lat = np.empty(1024, dtype=np.float64)
+        self._lon = np.empty(1024, dtype=np.float64)
+        self._size = 0
+        self._cells: dict[tuple[int, int], _Bucket] = {}
+        self._positions: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    def _grow(self, capacity: int) -> None:
+        if capacity <= len(self._ids):
+            return
+        capacity = max(capacity, len(self._ids) * 2)
+        self._ids = np.resize(self._ids, capacity)
+        self._lat = np.resize(self._lat, capacity)
+        self._lon = np.resize(self._lon, capacity)
+
+    def remove(self, client_id: int) -> None:
+        """Удаляет точку клиента из индекса, если она есть"""
+        position = self._positions.pop(client_id, None)
+        if position is None:
+            return
+        self._lat[position] = np.nan
+        self._lon[position] = np.nan
+        if self._size - len(self._positions) > max(len(self._positions), 1024):
+            self._compact()
+
+    def _append(self, client_id: int, latitude: float, longitude: float) -> None:
+        """Добавляет точку с координатами в радианах в конец массивов"""
+        self._grow(self._size + 1)
+        position = self._size
+        self._ids[position] = client_id
+        self._lat[position] = latitude
+        self._lon[position] = longitude
+        self._size += 1
+        self._positions[client_id] = position
+        cell = self._cell(math.degrees(latitude), math.degrees(longitude))
+        self._cells.setdefault(cell, _Bucket()).append(position)
+
+    def add(self, client_id: int, latitude: float, longitude: float) -> None:
+        """Добавляет точку клиента в индекс или заменяет уже имеющуюся"""
+        latitude, longitude = math.radians(latitude), math.radians(longitude)
+        position = self._positions.get(client_id)
+        if position is not None:
+            if self._lat[position] == latitude and self._lon[position] == longitude:
+                return
+            self.remove(client_id)
+        self._append(client_id, latitude, longitude)
+
+    def upsert(
+        self, client_id: int, latitude: float | None, longitude: float | None
+    ) -> None:
+        """Сохраняет координаты клиента, пустые координаты убирают его из индекса"""
+        if latitude is None or longitude is None:
+            self.remove(client_id)
+        else:
+            self.add(client_id, latitude, longitude)
+
+    def extend(self, points: Iterable[tuple[int, float | None, float | None]]) -> None:
+        """Сохраняет в индексе набор точек (id, широта, долгота)"""
+        for client_id, latitude, longitude in points:
+            self.upsert(client_id, latitude, longitude)
+
+    def _compact(self) -> None:
+        """Перестраивает массивы и ячейки без удаленных точек"""
+        positions = np.fromiter(
+            self._positions.values(), dtype=np.int64, count=len(self._positions)
+        )
+        live = zip(
+            self._ids[positions].tolist(),
+            self._lat[positions].tolist(),
+            self._lon[positions].tolist(),
+        )
+        self._size = 0
+        self._cells = {}
+        self._positions = {}
+        for client_id, latitude, longitude in live:
+            self._append(client_id, latitude, longitude)
+
+    def _candidate_cells(
+        self, latitude: float, longitude: float, distance: float
+    ) -> list[_Bucket]:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, distance)
+        lat_from, lat_to = self._cell(min_lat, 0)[0], self._cell(max_lat, 0)[0]
+
+        if min_lon is None:
+            return [
+                bucket
+                for (lat_cell, _), bucket in self._cells.items()
+                if lat_from <= lat_cell <= lat_to
+            ]
+
+        if min_lon <= max_lon:
+            lon_ranges = [(min_lon, max_lon)]
+        else:
+            lon_ranges = [(min_lon, 180.0), (-180.0, max_lon)]
+
+        buckets = []
+        for lat_cell in range(lat_from, lat_to + 1):
+            for range_from, range_to in lon_ranges:
+                lon_from = self._cell(0, range_from)[1]
+                lon_to = self._cell(0, range_to)[1]
+                for lon_cell in range(lon_from, lon_to + 1):
+                    bucket = self._cells.get((lat_cell, lon_cell))
+                    if bucket is not None:
+                        buckets.append(bucket)
+        return buckets
+
+    def query_radius(
+        self, latitude: float, longitude: float, distance: float
+    ) -> np.ndarray:
+        """
+        Возвращает id клиентов, находящихся не дальше distance км от точки.
+        Расстояние считается по той же формуле, что и geopy.great_circle
+        """
+        buckets = self._candidate_cells(latitude, longitude, distance)
+        if not buckets:
+            return np.empty(0, dtype=np.int64)
+        positions = np.concatenate([bucket.view() for bucket in buckets])
+
+        lat1, lng1 = math.radians(latitude), math.radians(longitude)
+        lat2, lng2 = self._lat[positions], self._lon[positions]
+        delta_lng = lng2 - lng1
+        cos_lat2 = np.cos(lat2)
+        sin_lat2 = np.sin(lat2)
+        cos_delta = np.cos(delta_lng)
+        central_angle = np.arctan2(
+            np.sqrt(
+                (cos_lat2 * np.sin(delta_lng)) ** 2
+                + (math.cos(lat1) * sin_lat2 - math.sin(lat1) * cos_lat2 * cos_delta)
+                ** 2
+            ),
+            math.sin(lat1) * sin_lat2 + math.cos(lat1) * cos_lat2 * cos_delta,
+        )
+        return self._ids[positions[EARTH_RADIUS_KM * central_angle <= distance]]
+
+
+geo_index = GeoIndex()
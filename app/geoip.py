@@ -0,0 +1,175 @@
+"""
+Локальная база координат по диапазонам ip адресов.
+
+Файл базы содержит отсортированные диапазоны по столбцам: старшие и младшие 64 бита
+начала и конца диапазона, широту и долготу. IPv4 хранится как IPv4-mapped IPv6,
+поэтому поиск одинаков для обеих версий. Файл открывается через mmap, все процессы
+приложения используют одну копию страниц в памяти, поиск - двоичный.
+
+Сборка файла из CSV со строками "начальный ip,конечный ip,широта,долгота":
+
+    python -m app.geoip build src.csv out.bin
+"""
+
+import argparse
+import csv
+import mmap
+import os
+import socket
+import struct
+
+import numpy as np
+
+MAGIC = b"GEOIPDB1"
+HEADER = struct.Struct("<8sQ")
+COLUMNS = (
+    ("start_hi", np.uint64),
+    ("start_lo", np.uint64),
+    ("end_hi", np.uint64),
+    ("end_lo", np.uint64),
+    ("latitude", np.float64),
+    ("longitude", np.float64),
+)
+LOW_MASK = (1 << 64) - 1
+
+
+IPV4_MAPPED = 0xFFFF << 32
+
+
+def ip_to_int(ip: str) -> int:
+    """Возвращает адрес как 128-битное число, IPv4 переводится в IPv4-mapped IPv6"""
+    ip = ip.strip()
+    try:
+        return IPV4_MAPPED | int.from_bytes(socket.inet_pton(socket.AF_INET, ip))
+    except OSError:
+        pass
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, ip))
+    except OSError:
+        raise ValueError(f"Некорректный ip адрес: {ip}") from None
+
+
+class GeoIPDatabase:
+    """Поиск координат по ip в файле базы, отображённом в память"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as db_file:
+            self._mmap = mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} не является файлом базы geoip")
+        self.count = count
+
+        offset = HEADER.size
+        for name, dtype in COLUMNS:
+            setattr(
+                self,
+                f"_{name}",
+                np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset),
+            )
+            offset += count * np.dtype(dtype).itemsize
+
+    def __len__(self) -> int:
+        return self.count
+
+    def lookup(self, ip: str) -> tuple[float | None, float | None]:
+        """
+        Возвращает (широта, долгота) диапазона, содержащего адрес,
+        или (None, None), если такого диапазона нет
+        """
+        value = ip_to_int(ip)
+        high, low = np.uint64(value >> 64), np.uint64(value & LOW_MASK)
+
+        # последний диапазон, начало которого не больше адреса
+        first = int(np.searchsorted(self._start_hi, high, side="left"))
+        last = int(np.searchsorted(self._start_hi, high, side="right"))
+        position = first + int(
+            np.searchsorted(self._start_lo[first:last], low, side="right")
+        )
+        position -= 1
+        if position < 0:
+            return None, None
+
+        end_hi, end_lo = self._end_hi[position], self._end_lo[position]
+        if end_hi < high or (end_hi == high and end_lo < low):
+            return None, None
+        return float(self._latitude[position]), float(self._longitude[position])
+
+    def close(self) -> None:
+        for name, _ in COLUMNS:
+            setattr(self, f"_{name}", None)
+        self._mmap.close()
+
+
+def read_ranges(source_path: str) -> list[tuple[int, int, float, float]]:
+    """Читает диапазоны из CSV, строка заголовка пропускается"""
+    ranges = []
+    with open(source_path, newline="") as source:
+        for number, row in enumerate(csv.reader(source)):
+            if not row:
+                continue
+            try:
+                start, end, latitude, longitude = row[:4]
+                ranges.append(
+                    (
+                        ip_to_int(start),
+                        ip_to_int(end),
+                        float(latitude),
+                        float(longitude),
+                    )
+                )
+            except ValueError:
+                if number == 0:
+                    continue
+                raise ValueError(f"Некорректная строка {number + 1}: {row}")
+    ranges.sort()
+    return ranges
+
+
+def build(source_path: str, output_path: str) -> int:
+    """
+    Собирает файл базы из CSV и возвращает число диапазонов.
+    Файл записывается во временный и подменяется целиком, поэтому процессы,
+    уже открывшие старую версию, продолжают с ней работать
+    """
+    ranges = read_ranges(source_path)
+    starts = [start for start, _, _, _ in ranges]
+    ends = [end for _, end, _, _ in ranges]
+    columns = (
+        np.array([value >> 64 for value in starts], dtype=np.uint64),
+        np.array([value & LOW_MASK for value in starts], dtype=np.uint64),
+        np.array([value >> 64 for value in ends], dtype=np.uint64),
+        np.array([value & LOW_MASK for value in ends], dtype=np.uint64),
+        np.array([latitude for _, _, latitude, _ in ranges], dtype=np.float64),
+        np.array([longitude for _, _, _, longitude in ranges], dtype=np.float64),
+    )
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "wb") as output:
+        output.write(HEADER.pack(MAGIC, len(ranges)))
+        for column in columns:
+            output.write(column.tobytes())
+    os.replace(tmp_path, output_path)
+    return len(ranges)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.geoip")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="собрать файл базы из CSV")
+    build_parser.add_argument("source")
+    build_parser.add_argument("output")
+    lookup_parser = commands.add_parser("lookup", help="найти координаты адреса")
+    lookup_parser.add_argument("database")
+    lookup_parser.add_argument("ip")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build(args.source, args.output)
+        print(f"{args.output}: {count} диапазонов")
+    else:
+        print(GeoIPDatabase(args.database).lookup(args.ip))
+
+
+if __name__ == "__main__":
+    main()
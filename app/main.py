@@ -1,9 +1,35 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+
+from app.api.endpoints import client, metrics, storage
+from app.core.config import settings
+from app.core.security import password_pool
+from app.db.session import async_session
+from app.repositories.client import ClientRepository
+from app.services.geolocation import geolocation
+from app.services.storage import image_pool
+
 
-from app.api.endpoints import client, storage
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Прогревает индекс координат клиентов при запуске приложения
+    и останавливает пулы обработки изображений и паролей и сервис геолокации
+    при завершении
+    """
+    if settings.GEO_BACKEND == "memory":
+        async with async_session() as session:
+            await ClientRepository(session).sync_geo_index()
+    yield
+    image_pool.shutdown()
+    password_pool.shutdown()
+    await geolocation.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,3 +41,6 @@ app.add_middleware(
 
 app.include_router(client.router, tags=["clients"])
 app.include_router(storage.router, tags=["storage"])
+app.include_router(metrics.router, tags=["metrics"])
+
+app.mount("/uploads", StaticFiles(directory="uploads", check_dir=False), name="uploads")
@@ -1,7 +1,9 @@
 from .client import Client
+from .email_job import EmailJob
 from .match import Match
 
 __all__ = [
     "Match",
     "Client",
+    "EmailJob",
 ]
@@ -1,14 +1,12 @@
 from enum import Enum as PyEnum
 
-from passlib.context import CryptContext
-from sqlalchemy import DateTime, Enum
+from sqlalchemy import DateTime, Enum, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
+from app.core.security import hash_password
 from app.db.base import Base
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 class GenderEnum(PyEnum):
     male = "male"
@@ -19,6 +17,33 @@ class Client(Base):
     """Модель описывающая пользователя"""
 
     __tablename__ = "clients"
+    __table_args__ = (
+        Index("ix_clients_latitude_longitude", "latitude", "longitude"),
+        Index("ix_clients_created_at_id", "created_at", "id"),
+        Index("ix_clients_updated_at", "updated_at"),
+        Index(
+            "ix_clients_first_name_trgm",
+            "first_name",
+            postgresql_using="gin",
+            postgresql_ops={"first_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_clients_last_name_trgm",
+            "last_name",
+            postgresql_using="gin",
+            postgresql_ops={"last_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_clients_first_name_lower_pattern",
+            func.lower(text("first_name")).label("first_name_lower"),
+            postgresql_ops={"first_name_lower": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_clients_last_name_lower_pattern",
+            func.lower(text("last_name")).label("last_name_lower"),
+            postgresql_ops={"last_name_lower": "text_pattern_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     avatar: Mapped[str] = mapped_column(nullable=True)
@@ -32,10 +57,16 @@ class Client(Base):
     created_at: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
+    updated_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
-    def set_password(self, password: str):
-        """Функция хэширует полученный пароль и устанавливает пользователю"""
-        self.hashed_password = pwd_context.hash(password)
+    async def set_password(self, password: str):
+        """
+        Функция хэширует полученный пароль в пуле потоков для паролей
+        и устанавливает пользователю
+        """
+        self.hashed_password = await hash_password(password)
 
     def set_latitude(self, latitude: float):
         """Функция устанавливает значение широты"""
@@ -0,0 +1,46 @@
+from enum import Enum as PyEnum
+
+from sqlalchemy import DateTime, Enum, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class EmailStatusEnum(PyEnum):
+    pending = "pending"
+    sent = "sent"
+    failed = "failed"
+
+
+class EmailJob(Base):
+    """Модель очереди писем, которые отправляет отдельный воркер"""
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    recipient: Mapped[str] = mapped_column(nullable=False)
+    subject: Mapped[str] = mapped_column(nullable=False)
+    body: Mapped[str] = mapped_column(nullable=False)
+    status: Mapped[EmailStatusEnum] = mapped_column(
+        Enum(EmailStatusEnum), nullable=False, default=EmailStatusEnum.pending
+    )
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    last_error: Mapped[str] = mapped_column(nullable=True)
+    next_attempt_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    locked_until: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    created_at: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+    sent_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import DateTime
+from sqlalchemy import DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
@@ -9,6 +9,11 @@ class Match(Base):
     """Модель таблицы содержащей взаимные симпатии"""
 
     __tablename__ = "match"
+    __table_args__ = (
+        Index("ix_match_client_id_created_at", "client_id", "created_at"),
+        Index("ix_match_target_id_client_id", "target_id", "client_id"),
+        UniqueConstraint("client_id", "target_id", name="uq_match_client_id_target_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     client_id: Mapped[int] = mapped_column(nullable=False)
@@ -1,17 +1,140 @@
-from datetime import datetime
-from typing import Sequence
+import math
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Sequence
 
-from aiocache import Cache, cached
-from aiocache.serializers import PickleSerializer
 from fastapi import HTTPException, Request
-from sqlalchemy import and_
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    Row,
+    Select,
+    and_,
+    any_,
+    bindparam,
+    func,
+    literal,
+    or_,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.core.cache import build_key, clients_cache, clients_generations, users_cache
+from app.core.config import settings
+from app.geo import geo_index
 from app.models.client import Client
 from app.models.match import Match
-from app.schemas.client import ClientCreate
-from app.utils import calculate_distance, get_location, my_key_builder
+from app.schemas.auth import Principal
+from app.schemas.client import ClientCreate, ClientFilters, ClientPage
+from app.utils import (
+    EARTH_RADIUS_KM,
+    as_utc,
+    bounding_box,
+    decode_cursor,
+    encode_cursor,
+    escape_like,
+)
+
+# Максимальное число ячеек, от которых может зависеть страница списка клиентов
+MAX_GEO_GROUPS = 64
+
+
+def distance_condition(
+    latitude: float, longitude: float, distance: float
+) -> ColumnElement[bool]:
+    """
+    Возвращает условие отбора клиентов, находящихся не дальше distance км от точки.
+    Грубый отбор по прямоугольнику использует индекс по (latitude, longitude),
+    точная проверка повторяет формулу geopy.great_circle
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, distance)
+    conditions = [Client.latitude.between(min_lat, max_lat)]
+    if min_lon is not None:
+        if min_lon <= max_lon:
+            conditions.append(Client.longitude.between(min_lon, max_lon))
+        else:
+            conditions.append(
+                or_(Client.longitude >= min_lon, Client.longitude <= max_lon)
+            )
+
+    lat1, lng1 = func.radians(latitude), func.radians(longitude)
+    lat2, lng2 = func.radians(Client.latitude), func.radians(Client.longitude)
+    delta_lng = lng2 - lng1
+    central_angle = func.atan2(
+        func.sqrt(
+            func.power(func.cos(lat2) * func.sin(delta_lng), 2)
+            + func.power(
+                func.cos(lat1) * func.sin(lat2)
+                - func.sin(lat1) * func.cos(lat2) * func.cos(delta_lng),
+                2,
+            )
+        ),
+        func.sin(lat1) * func.sin(lat2)
+        + func.cos(lat1) * func.cos(lat2) * func.cos(delta_lng),
+    )
+    conditions.append(EARTH_RADIUS_KM * central_angle <= distance)
+    return and_(*conditions)
+
+
+def distance_origin(
+    current_user: Principal, filters: ClientFilters
+) -> tuple[float, float] | None:
+    """
+    Точка отсчета фильтра по расстоянию: координаты пользователя,
+    если фильтр задан и координаты известны. Общая для списка и выгрузки
+    """
+    if (
+        filters.distance
+        and current_user.latitude is not None
+        and current_user.longitude is not None
+    ):
+        return current_user.latitude, current_user.longitude
+    return None
+
+
+def _geo_group(latitude: float, longitude: float) -> str:
+    cell_size = settings.CACHE_GEO_GROUP_DEGREES
+    return f"geo:{math.floor(latitude / cell_size)}:{math.floor(longitude / cell_size)}"
+
+
+def client_groups(client: Client) -> list[str]:
+    """Возвращает группы кэша списков клиентов, на которые влияет запись клиента"""
+    gender = getattr(client.gender, "value", client.gender)
+    groups = ["gender:*", f"gender:{gender}", "geo:*"]
+    if client.latitude is not None and client.longitude is not None:
+        groups.append(_geo_group(client.latitude, client.longitude))
+    return groups
+
+
+def query_groups(
+    filters: ClientFilters, origin: tuple[float, float] | None
+) -> list[str]:
+    """
+    Возвращает группы кэша, от которых зависит страница списка клиентов.
+    Запрос с фильтром по расстоянию зависит от ячеек, пересекающих окрестность,
+    если ячеек слишком много - от общей группы geo:*.
+    Остальные запросы зависят от группы пола или от всех клиентов
+    """
+    if filters.distance and origin is not None:
+        min_lat, max_lat, min_lon, max_lon = bounding_box(*origin, filters.distance)
+        if min_lon is None or min_lon > max_lon:
+            return ["geo:*"]
+        cell_size = settings.CACHE_GEO_GROUP_DEGREES
+        lat_cells = range(
+            math.floor(min_lat / cell_size), math.floor(max_lat / cell_size) + 1
+        )
+        lon_cells = range(
+            math.floor(min_lon / cell_size), math.floor(max_lon / cell_size) + 1
+        )
+        if len(lat_cells) * len(lon_cells) > MAX_GEO_GROUPS:
+            return ["geo:*"]
+        return [f"geo:{lat}:{lon}" for lat in lat_cells for lon in lon_cells]
+    if filters.gender:
+        return [f"gender:{filters.gender}"]
+    return ["gender:*"]
 
 
 class ClientRepository:
@@ -30,66 +153,149 @@ class ClientRepository:
         )
         return result.scalars().first()
 
-    @cached(
-        ttl=60,
-        cache=Cache.REDIS,
-        key_builder=my_key_builder,
-        serializer=PickleSerializer(),
-        port=6379,
-        namespace="main",
-    )
-    async def get_clients(
-        self,
-        current_user: Client,
-        gender: str | None = None,
-        first_name: str | None = None,
-        last_name: str | None = None,
-        distance: float | None = None,
-        created_at: datetime | None = None,
-    ) -> Sequence[Client]:
-        """Возвращает список клиентов с учетом фильтров"""
+    async def build_clients_query(
+        self, filters: ClientFilters, origin: tuple[float, float] | None
+    ) -> Select:
+        """
+        Строит запрос клиентов с учетом фильтров, упорядоченный по (created_at, id).
+        Имя и фамилия ищутся по подстроке (name_match="contains", trigram-индекс)
+        или по началу строки без учета регистра (name_match="prefix", btree-индекс).
+        Дата регистрации фильтруется диапазоном [created_after, created_before),
+        created_at отбирает клиентов, зарегистрированных в тот же календарный день.
+        Расстояние отсчитывается от точки origin
+        """
 
-        query = select(Client)
+        query = select(Client).order_by(Client.created_at, Client.id)
 
         conditions = []
 
-        if gender:
-            conditions.append(Client.gender == gender)
-        if first_name:
-            conditions.append(Client.first_name.ilike(f"%{first_name}%"))
-        if last_name:
-            conditions.append(Client.last_name.ilike(f"%{last_name}%"))
-        if created_at:
-            conditions.append((Client.created_at.ilike(f"%{created_at}%")))
+        if filters.gender:
+            conditions.append(Client.gender == filters.gender)
+        for column, value in (
+            (Client.first_name, filters.first_name),
+            (Client.last_name, filters.last_name),
+        ):
+            if not value:
+                continue
+            if filters.name_match == "prefix":
+                conditions.append(
+                    func.lower(column).like(f"{escape_like(value.lower())}%")
+                )
+            else:
+                conditions.append(column.ilike(f"%{escape_like(value)}%"))
+        if filters.created_at:
+            day_start = as_utc(filters.created_at).replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
+            conditions.append(Client.created_at >= day_start)
+            conditions.append(Client.created_at < day_start + timedelta(days=1))
+        if filters.created_after:
+            conditions.append(Client.created_at >= as_utc(filters.created_after))
+        if filters.created_before:
+            conditions.append(Client.created_at < as_utc(filters.created_before))
+        if filters.distance:
+            if origin is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Координаты текущего пользователя не установлены.",
+                )
+            if settings.GEO_BACKEND == "memory":
+                await self.sync_geo_index()
+                client_ids = geo_index.query_radius(*origin, filters.distance)
+                conditions.append(
+                    Client.id
+                    == any_(
+                        bindparam("geo_ids", client_ids.tolist(), type_=ARRAY(Integer))
+                    )
+                )
+            else:
+                conditions.append(distance_condition(*origin, filters.distance))
 
         if conditions:
             query = query.where(and_(*conditions))
+        return query
+
+    async def get_clients(
+        self,
+        current_user: Principal,
+        filters: ClientFilters,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> ClientPage:
+        """
+        Возвращает страницу клиентов с учетом фильтров.
+        Клиенты упорядочены по (created_at, id), следующая страница
+        запрашивается по курсору next_cursor.
+        Страницы кэшируются по значениям фильтров, для фильтра по расстоянию
+        в ключ входят точные координаты пользователя, от которых считается
+        расстояние, поэтому результат совпадает с выгрузкой /api/list/export.
+        В ключ входят поколения групп, от которых зависит страница, поэтому
+        изменения клиентов сбрасывают кэш без ожидания истечения TTL
+        """
+        limit = min(limit or settings.CLIENTS_PAGE_SIZE, settings.CLIENTS_PAGE_SIZE_MAX)
+        origin = distance_origin(current_user, filters)
+        groups = query_groups(filters, origin)
+        key = build_key(
+            "list",
+            generations=dict(zip(groups, await clients_generations.get(groups))),
+            origin=origin,
+            limit=limit,
+            cursor=cursor,
+            **filters.model_dump(mode="json"),
+        )
+
+        async def load_page() -> dict:
+            query = await self.build_clients_query(filters, origin)
+            page = await self.fetch_clients_page(query, limit, cursor)
+            return page.model_dump(mode="json")
+
+        data = await clients_cache.get_or_load(
+            key, load_page, ttl=settings.CLIENTS_CACHE_TTL
+        )
+        return ClientPage.model_validate(data)
+
+    async def fetch_clients_page(
+        self, query: Select, limit: int, cursor: str | None
+    ) -> ClientPage:
+        """Выполняет запрос клиентов и возвращает страницу, начиная с позиции курсора"""
+        query = query.limit(limit + 1)
+        if cursor:
+            try:
+                cursor_created_at, cursor_id = decode_cursor(cursor)
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc))
+            query = query.where(
+                tuple_(Client.created_at, Client.id)
+                > tuple_(cursor_created_at, cursor_id)
+            )
 
         result = await self.session.execute(query)
         clients = result.scalars().all()
 
-        if distance:
-            if not current_user.latitude or not current_user.longitude:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Координаты текущего пользователя не установлены.",
-                )
-            clients = [
-                client
-                for client in clients
-                if calculate_distance(
-                    current_user.latitude,
-                    current_user.longitude,
-                    client.latitude,
-                    client.longitude,
-                )
-                <= distance
-            ]
+        next_cursor = None
+        if len(clients) > limit:
+            clients = clients[:limit]
+            next_cursor = encode_cursor(clients[-1].created_at, clients[-1].id)
+        return ClientPage(items=clients, next_cursor=next_cursor)
 
-        return clients
+    async def stream_clients(
+        self, query: Select, chunk_size: int
+    ) -> AsyncIterator[Sequence[Client]]:
+        """
+        Выполняет запрос клиентов через серверный курсор
+        и отдает результат порциями по chunk_size строк
+        """
+        result = await self.session.stream_scalars(
+            query.execution_options(yield_per=chunk_size)
+        )
+        async for chunk in result.partitions(chunk_size):
+            yield chunk
 
     async def create_client(
-        self, request: Request, client_data: ClientCreate
+        self,
+        client_data: ClientCreate,
+        latitude: float | None = None,
+        longitude: float | None = None,
     ) -> Client:
         """Создание нового клиента и сохранение в базе данных."""
         new_client = Client(
@@ -99,47 +305,190 @@ class ClientRepository:
             gender=client_data.gender,
             avatar=client_data.avatar_url,
         )
-        client_ip = self.get_client_ip(request)
-        location = await get_location(client_ip)
-        new_client.set_latitude(location[0])
-        new_client.set_longitude(location[1])
+        new_client.set_latitude(latitude)
+        new_client.set_longitude(longitude)
 
-        new_client.set_password(client_data.password)
+        await new_client.set_password(client_data.password)
         self.session.add(new_client)
         await self.session.commit()
         await self.session.refresh(new_client)
+        self.index_client_location(new_client)
+        await self.invalidate_client_lists(new_client)
         return new_client
 
-    async def check_mutual_match(self, client_id: int, target_client_id: int) -> Match | None:
+    async def update_location(
+        self, client_id: int, latitude: float, longitude: float
+    ) -> Client | None:
+        """Сохраняет координаты клиента и сбрасывает зависящие от них кэши"""
+        client = await self.session.get(Client, client_id)
+        if client is None:
+            return None
+        client.set_latitude(latitude)
+        client.set_longitude(longitude)
+        await self.session.commit()
+        self.index_client_location(client)
+        await self.invalidate_client_lists(client)
+        return client
+
+    async def update_password_hash(
+        self, client_id: int, old_hash: str, new_hash: str
+    ) -> bool:
         """
-        Проверяет, существует ли взаимная симпатия между текущим пользователем и target_client_id.
+        Заменяет хэш пароля клиента, если пароль не менялся с момента чтения old_hash
         """
-        query = select(Match).where(
-            Match.client_id == target_client_id, Match.target_id == client_id
+        result = await self.session.execute(
+            update(Client)
+            .where(Client.id == client_id, Client.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
         )
+        await self.session.commit()
+        return result.rowcount > 0
+
+    @classmethod
+    async def invalidate_client_lists(cls, client: Client) -> None:
+        """
+        Сбрасывает закэшированные страницы списка, на которые влияет клиент.
+        Вызывается после любого сохранения изменений профиля клиента,
+        ошибки кэша не прерывают запрос: данные уже сохранены
+        """
+        await clients_generations.bump(client_groups(client))
+        await users_cache.delete(f"user:{client.id}")
+
+    @classmethod
+    def index_client_location(cls, client: Client) -> None:
+        """
+        Сразу обновляет координаты клиента в индексе текущего процесса,
+        остальные процессы получат их при синхронизации
+        """
+        if settings.GEO_BACKEND == "memory":
+            geo_index.upsert(client.id, client.latitude, client.longitude)
+
+    async def sync_geo_index(self) -> None:
+        """
+        Догружает в индекс координат клиентов, созданных или измененных после
+        последней синхронизации, в том числе через другие процессы приложения.
+        updated_at берется из времени начала транзакции, поэтому строки, которые
+        зафиксированы позже более новых, перечитываются за счет окна
+        GEO_INDEX_SYNC_OVERLAP перед отметкой прошлой синхронизации
+        """
+        query = select(Client.id, Client.latitude, Client.longitude, Client.updated_at)
+        if geo_index.synced_at is not None:
+            query = query.where(
+                Client.updated_at
+                >= geo_index.synced_at
+                - timedelta(seconds=settings.GEO_INDEX_SYNC_OVERLAP)
+            )
+        else:
+            query = query.where(
+                Client.latitude.is_not(None), Client.longitude.is_not(None)
+            )
         result = await self.session.execute(query)
-        match = result.scalars().first()
-        return match is not None
+        for client_id, latitude, longitude, updated_at in result:
+            geo_index.upsert(client_id, latitude, longitude)
+            if geo_index.synced_at is None or updated_at > geo_index.synced_at:
+                geo_index.synced_at = updated_at
 
-    async def add_match(self, current_user_id: int, target_client_id: int) -> None:
+    async def record_match(self, client_id: int, target_client_id: int) -> Row | None:
         """
-        Добавляет симпатию от текущего пользователя к target_client_id.
+        Атомарно добавляет симпатию от client_id к target_client_id и проверяет,
+        есть ли обратная симпатия. Возвращает строку (id, first_name, email,
+        inserted, mutual) целевого пользователя или None, если его не существует.
+        Транзакцию фиксирует вызывающий код
         """
-        new_match = Match(client_id=current_user_id, target_id=target_client_id)
-        self.session.add(new_match)
-        await self.session.commit()
+        matches = await self.record_matches(client_id, [target_client_id])
+        return matches[0] if matches else None
 
-    async def get_ratings_by_client(self, current_user: Client, since_time: datetime) -> Sequence[Match]:
+    async def record_matches(
+        self, client_id: int, target_client_ids: list[int]
+    ) -> Sequence[Row]:
         """
-        Возвращает список оценок пользователя других пользователей
-        за определенный промежуток времени
+        Атомарно добавляет симпатии от client_id к target_client_ids.
+        Существование целей проверяется одним запросом, вставка выполняется
+        одним INSERT без повторов, взаимность определяется одним соединением.
+        Оценки одной пары пользователей сериализуются advisory-блокировками,
+        которые берутся в едином порядке, поэтому одновременные встречные
+        симпатии не пропускают взаимность и не приводят к взаимоблокировке.
+        Возвращает строки (id, first_name, email, inserted, mutual)
+        для существующих целевых пользователей. Транзакцию фиксирует вызывающий код,
+        чтобы в нее же попали письма о взаимных симпатиях
         """
-        stmt = select(Match).filter(
-            Match.client_id == current_user.id, Match.created_at >= since_time
+        pairs = sorted(
+            {
+                (min(client_id, target_id), max(client_id, target_id))
+                for target_id in target_client_ids
+            }
+        )
+        lock_pairs = (
+            func.unnest(
+                bindparam("lock_a", [pair[0] for pair in pairs], type_=ARRAY(Integer)),
+                bindparam("lock_b", [pair[1] for pair in pairs], type_=ARRAY(Integer)),
+            )
+            .table_valued("a", "b")
+            .render_derived(name="pairs")
+        )
+        # pg_advisory_xact_lock изменчива, поэтому вычисляется после ORDER BY
+        # и блокировки берутся строго в порядке сортировки пар
+        await self.session.execute(
+            select(func.pg_advisory_xact_lock(lock_pairs.c.a, lock_pairs.c.b)).order_by(
+                lock_pairs.c.a, lock_pairs.c.b
+            )
+        )
+
+        targets = (
+            select(Client.id, Client.first_name, Client.email)
+            .where(
+                Client.id
+                == any_(
+                    bindparam("target_ids", target_client_ids, type_=ARRAY(Integer))
+                )
+            )
+            .cte("targets")
+        )
+        inserted = (
+            pg_insert(Match)
+            .from_select(
+                ["client_id", "target_id"],
+                select(literal(client_id, Integer), targets.c.id),
+            )
+            .on_conflict_do_nothing(index_elements=["client_id", "target_id"])
+            .returning(Match.target_id)
+            .cte("inserted")
+        )
+        reverse = select(Match.client_id).where(Match.target_id == client_id).subquery()
+        query = (
+            select(
+                targets.c.id,
+                targets.c.first_name,
+                targets.c.email,
+                inserted.c.target_id.is_not(None).label("inserted"),
+                reverse.c.client_id.is_not(None).label("mutual"),
+            )
+            .outerjoin(inserted, inserted.c.target_id == targets.c.id)
+            .outerjoin(reverse, reverse.c.client_id == targets.c.id)
+        )
+        result = await self.session.execute(query)
+        return result.all()
+
+    async def count_ratings_by_client(
+        self, client_id: int, since_time: datetime, cap: int
+    ) -> tuple[int, datetime | None]:
+        """
+        Возвращает количество оценок пользователя с момента since_time,
+        но не больше cap, и время самой ранней из них.
+        Запрос читает только индекс (client_id, created_at)
+        """
+        recent = (
+            select(Match.created_at)
+            .where(Match.client_id == client_id, Match.created_at >= since_time)
+            .order_by(Match.created_at)
+            .limit(cap)
+            .subquery()
+        )
+        result = await self.session.execute(
+            select(func.count(), func.min(recent.c.created_at))
         )
-        result = await self.session.execute(stmt)
-        ratings = result.scalars().all()
-        return ratings
+        count, oldest = result.one()
+        return count, oldest
 
     @classmethod
     def get_client_ip(cls, request: Request) -> str:
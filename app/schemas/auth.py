@@ -10,3 +10,11 @@ class Token(BaseModel):
 class UserAuth(BaseModel):
     email: EmailStr
     password: str
+
+
+class Principal(BaseModel):
+    id: int
+    first_name: str
+    email: EmailStr
+    latitude: float | None = None
+    longitude: float | None = None
@@ -2,7 +2,9 @@ from datetime import datetime
 from enum import Enum
 
 from fastapi import UploadFile
-from pydantic import BaseModel, ConfigDict, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, computed_field
+
+from app.utils import avatar_rendition
 
 
 class GenderEnum(str, Enum):
@@ -34,10 +36,32 @@ class Client(BaseModel):
     latitude: float | None = None
     longitude: float | None = None
 
+    @computed_field
+    @property
+    def avatar_thumb(self) -> str | None:
+        """Миниатюра аватара для списков"""
+        return avatar_rendition(self.avatar, "thumb")
+
     class Config:
         from_attributes = True
         config = ConfigDict(arbitrary_types_allowed=True)
 
 
+class ClientFilters(BaseModel):
+    gender: str | None = None
+    first_name: str | None = None
+    last_name: str | None = None
+    name_match: str = "contains"
+    distance: float | None = None
+    created_at: datetime | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+
+
+class ClientPage(BaseModel):
+    items: list[Client]
+    next_cursor: str | None = None
+
+
 class AvatarUpload(BaseModel):
     avatar: UploadFile
@@ -1,4 +1,8 @@
-from pydantic import BaseModel
+from enum import Enum
+
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
 
 
 class Client(BaseModel):
@@ -8,3 +12,29 @@ class Client(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class MatchBatch(BaseModel):
+    # пачка больше суточного лимита оценок никогда не пройдет проверку лимита,
+    # поэтому отклоняется сразу с ошибкой 422
+    target_ids: list[int] = Field(
+        min_length=1,
+        max_length=min(settings.MATCH_BATCH_MAX_SIZE, settings.RATINGS_PER_DAY),
+    )
+
+
+class MatchStatus(str, Enum):
+    not_found = "not_found"
+    sent = "sent"
+    already_sent = "already_sent"
+    mutual = "mutual"
+
+
+class MatchResult(BaseModel):
+    target_id: int
+    status: MatchStatus
+    email: str | None = None
+
+
+class MatchBatchResult(BaseModel):
+    results: list[MatchResult]
@@ -1,3 +1,5 @@
+import asyncio
+import logging
 from datetime import datetime, timedelta, timezone
 
 import jwt
@@ -6,17 +8,38 @@ from pydantic import EmailStr
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.core.security import (
+    decode_token,
+    hash_password,
+    password_needs_update,
+    verify_password,
+)
+from app.db.session import async_session
 from app.models import Client
 from app.repositories.client import ClientRepository
 from app.schemas.auth import UserAuth
-from app.services.client import verify_password
 
+logger = logging.getLogger(__name__)
 
-def create_access_token(user_id: int) -> str:
+_rehash_tasks: set[asyncio.Task] = set()
+
+
+def principal_claims(user: Client) -> dict:
+    """
+    Возвращает claims с данными пользователя, которые нужны для обработки запросов
+    без обращения к БД
+    """
+    location = None
+    if user.latitude is not None and user.longitude is not None:
+        location = [user.latitude, user.longitude]
+    return {"name": user.first_name, "email": user.email, "loc": location}
+
+
+def create_access_token(user_id: int, claims: dict | None = None) -> str:
     """Создание JWT токена с заданными данными и сроком действия."""
-    to_encode = {"sub": str(user_id)}
+    to_encode = {"sub": str(user_id), **(claims or {})}
     expire = datetime.now(timezone.utc) + timedelta(
-        settings.ACCESS_TOKEN_EXPIRE_MINUTES
+        minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
     to_encode.update({"exp": expire})
     encode_jwt = jwt.encode(
@@ -24,8 +47,13 @@ def create_access_token(user_id: int) -> str:
     )
     return encode_jwt
 
+
 def create_refresh_token(user_id: int) -> str:
-    """Создание рефреш токена с длительным сроком действия."""
+    """
+    Создание рефреш токена с длительным сроком действия.
+    Токен содержит только идентификатор пользователя, данные для access токена
+    при обновлении заново читаются из БД.
+    """
     to_encode = {"sub": str(user_id)}
     expire = datetime.now(timezone.utc) + timedelta(
         minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
@@ -37,50 +65,85 @@ def create_refresh_token(user_id: int) -> str:
     return refresh_jwt
 
 
-def refresh_access_token(refresh_token: str) -> dict:
+async def refresh_access_token(refresh_token: str, session: AsyncSession) -> dict:
     """
     Обновляет access токен с помощью refresh токена.
+    Данные пользователя для claims берутся из БД, чтобы новый токен
+    не переносил устаревшие имя, email и координаты.
     """
     try:
-        payload = jwt.decode(refresh_token, settings.REFRESH_SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token(refresh_token, settings.REFRESH_SECRET_KEY)
         user_id = payload.get("sub")
 
         if user_id is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Недействительный refresh токен"
+                detail="Недействительный refresh токен",
             )
 
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Срок действия refresh токена истек"
+            detail="Срок действия refresh токена истек",
         )
     except jwt.PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Недействительный refresh токен"
+            detail="Недействительный refresh токен",
+        )
+
+    user = await ClientRepository(session).get_by_id(int(user_id))
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Недействительный refresh токен",
+        )
+    new_access_token = create_access_token(user.id, principal_claims(user))
+
+    return {"access_token": new_access_token, "token_type": "bearer"}
+
+
+async def rehash_password(user_id: int, password: str, old_hash: str) -> None:
+    """Пересчитывает хэш пароля с текущими параметрами и сохраняет его"""
+    new_hash = await hash_password(password)
+    async with async_session() as session:
+        await ClientRepository(session).update_password_hash(
+            user_id, old_hash, new_hash
         )
 
-    new_access_token = create_access_token(int(user_id))
 
-    return {
-        "access_token": new_access_token,
-        "token_type": "bearer"
-    }
+def _rehash_done(task: asyncio.Task) -> None:
+    _rehash_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Не удалось обновить хэш пароля", exc_info=task.exception())
 
-async def authenticate_user(session: AsyncSession, email: EmailStr, password: str) -> Client | None:
-    """Проверяет, существует ли пользователь с указанным email, и совпадает ли его пароль."""
+
+def schedule_rehash(user_id: int, password: str, old_hash: str) -> None:
+    """Запускает пересчёт устаревшего хэша пароля в фоне"""
+    task = asyncio.create_task(rehash_password(user_id, password, old_hash))
+    _rehash_tasks.add(task)
+    task.add_done_callback(_rehash_done)
+
+
+async def authenticate_user(
+    session: AsyncSession, email: EmailStr, password: str
+) -> Client | None:
+    """
+    Проверяет, существует ли пользователь с указанным email, и совпадает ли его пароль.
+    Если хэш пароля получен с устаревшими параметрами, он пересчитывается в фоне.
+    """
     client_repo = ClientRepository(session)
     user = await client_repo.get_by_email(email=email)
     if (
         not user
-        or verify_password(
+        or await verify_password(
             plain_password=password, hashed_password=user.hashed_password
         )
         is False
     ):
         return None
+    if password_needs_update(user.hashed_password):
+        schedule_rehash(user.id, password, user.hashed_password)
     return user
 
 
@@ -95,7 +158,8 @@ async def auth_user_f(user_data: UserAuth, session: AsyncSession) -> dict:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail='Неверная почта или пароль'
         )
-    access_token = create_access_token(user.id)
+    claims = principal_claims(user)
+    access_token = create_access_token(user.id, claims)
     refresh_token = create_refresh_token(user.id)
 
     return {'access_token': access_token, "refresh_token": refresh_token}
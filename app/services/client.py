@@ -1,19 +1,23 @@
 from datetime import datetime, timezone
-from typing import Sequence
+from typing import AsyncIterator
 
 import jwt
-from fastapi import BackgroundTasks, Depends, HTTPException, Request, status
-from jose import jwt
-from passlib.context import CryptContext
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import Row, Select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import users_cache
 from app.core.config import settings
-from app.db.session import get_session
-from app.repositories.client import ClientRepository
-from app.schemas.client import Client, ClientCreate
-from app.services.send_email import send_email_to_user
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.security import decode_token
+from app.db.session import async_session, get_session
+from app.models.email_job import EmailJob
+from app.repositories.client import ClientRepository, distance_origin
+from app.schemas.auth import Principal
+from app.schemas.client import Client, ClientCreate, ClientFilters, ClientPage
+from app.schemas.match import MatchBatchResult, MatchResult, MatchStatus
+from app.services.geolocation import geolocation
+from app.services.ratings import refund_ratings
+from app.services.send_email import build_match_email, enqueue_emails
 
 
 async def create_client_f(
@@ -21,21 +25,22 @@ async def create_client_f(
 ) -> Client:
     """
     Создает экземпляр репозитория для работы с клиентами, проверяет существование email,
-    сохраняет аватар, если загружен, создаёт нового пользователя через репозиторий.
+    определяет координаты по ip и создаёт нового пользователя через репозиторий.
+    В режиме GEOLOCATION_MODE=async координаты заполняются в фоне после создания.
     """
     client_repo = ClientRepository(session)
     if await client_repo.get_by_email(client_data.email):
         raise HTTPException(status_code=400, detail="Данный email уже используется")
-    new_client = await client_repo.create_client(request, client_data)
-
-    return new_client
 
+    client_ip = ClientRepository.get_client_ip(request)
+    latitude = longitude = None
+    if settings.GEOLOCATION_MODE != "async":
+        latitude, longitude = await geolocation.locate(client_ip)
+    new_client = await client_repo.create_client(client_data, latitude, longitude)
+    if settings.GEOLOCATION_MODE == "async":
+        geolocation.schedule_fill(new_client.id, client_ip)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """
-    Проверяет, совпадает ли введенный пароль с хешем в базе данных.
-    """
-    return pwd_context.verify(plain_password, hashed_password)
+    return new_client
 
 
 def get_token(request: Request) -> dict:
@@ -53,9 +58,7 @@ def get_token(request: Request) -> dict:
     token = auth_header[len("Bearer ") :]
 
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_token(token, settings.SECRET_KEY)
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -69,12 +72,8 @@ def get_token(request: Request) -> dict:
         )
 
 
-async def get_current_user(
-    request: Request, session: AsyncSession = Depends(get_session)
-) -> Client:
-    """Функция возвращает текущего пользователя"""
-    payload = get_token(request)
-
+def get_user_id(payload: dict) -> int:
+    """Проверяет срок действия токена и возвращает ID пользователя из него"""
     expire = payload.get('exp')
     expire_time = datetime.fromtimestamp(int(expire), tz=timezone.utc)
     if (not expire) or (expire_time < datetime.now(timezone.utc)):
@@ -87,79 +86,215 @@ async def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail='Не найден ID пользователя'
         )
+    return int(user_id)
 
-    client_repo = ClientRepository(session)
-    user = await client_repo.get_by_id(client_id=int(user_id))
+
+async def get_current_user(
+    request: Request, session: AsyncSession = Depends(get_session)
+) -> Client:
+    """Функция возвращает текущего пользователя"""
+    user_id = get_user_id(get_token(request))
+
+    async def load_user() -> dict | None:
+        client_repo = ClientRepository(session)
+        user = await client_repo.get_by_id(client_id=user_id)
+        if not user:
+            return None
+        return Client.model_validate(user).model_dump(mode="json")
+
+    user = await users_cache.get_or_load(
+        f"user:{user_id}", load_user, ttl=settings.USER_CACHE_TTL
+    )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail='User not found'
         )
 
-    return user
+    return Client.model_validate(user)
 
 
-async def match_client_f(
-    target_client_id: int,
-    background_tasks: BackgroundTasks,
-    current_user: Client,
-    session: AsyncSession,
-) -> dict:
+async def get_current_principal(
+    request: Request, session: AsyncSession = Depends(get_session)
+) -> Principal:
     """
-    Функция проверяет, существует ли целевой пользователь, создаёт запись об оценке,
-    проверяет есть ли взаимная симпатия, если да, то отправляет email обоим пользователям об этом
+    Функция возвращает данные текущего пользователя, нужные для обработки запроса.
+    Данные берутся из подписанных claims access токена без обращения к БД,
+    для токенов без claims - из кэшированной проекции пользователя.
+    Результат сохраняется в request.state и переиспользуется в пределах запроса
     """
-    client_repo = ClientRepository(session)
-    target_client = await client_repo.get_by_id(target_client_id)
-    if not target_client:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Участник не найден"
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+
+    payload = get_token(request)
+    user_id = get_user_id(payload)
+    if "email" in payload:
+        location = payload.get("loc") or (None, None)
+        principal = Principal(
+            id=user_id,
+            first_name=payload.get("name"),
+            email=payload["email"],
+            latitude=location[0],
+            longitude=location[1],
         )
+    else:
+        user = await get_current_user(request, session)
+        principal = Principal.model_validate(user.model_dump())
+
+    request.state.principal = principal
+    return principal
 
-    has_mutual_match = await client_repo.check_mutual_match(
-        current_user.id, target_client_id
-    )
-    await client_repo.add_match(current_user.id, target_client_id)
 
-    if has_mutual_match:
-        await send_email_to_user(
-            background_tasks,
+def mutual_match_emails(current_user: Principal, target_client: Row) -> list[EmailJob]:
+    """Функция формирует письма обоим участникам взаимной симпатии"""
+    return [
+        build_match_email(
             user_name=current_user.first_name,
             user_email=current_user.email,
             target_user_email=target_client.email,
-        )
-        await send_email_to_user(
-            background_tasks,
+        ),
+        build_match_email(
             user_name=target_client.first_name,
             user_email=target_client.email,
             target_user_email=current_user.email,
+        ),
+    ]
+
+
+async def match_client_f(
+    target_client_id: int,
+    current_user: Principal,
+    session: AsyncSession,
+) -> dict:
+    """
+    Функция атомарно создаёт запись об оценке, если целевой пользователь существует,
+    и проверяет есть ли взаимная симпатия, если да и оценка новая,
+    то ставит в очередь email обоим пользователям об этом в той же транзакции.
+    Оценка, которая не была сохранена, возвращается в лимит оценок
+    """
+    client_repo = ClientRepository(session)
+    target_client = await client_repo.record_match(current_user.id, target_client_id)
+    if not target_client or not target_client.inserted:
+        await refund_ratings(current_user, 1)
+    if not target_client:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Участник не найден"
         )
 
+    if target_client.mutual and target_client.inserted:
+        enqueue_emails(session, mutual_match_emails(current_user, target_client))
+    await session.commit()
+
+    if target_client.mutual:
         return {
-            "message": f"Взаимная симпатия с {target_client.first_name}! Почта: {target_client.email}"
+            "message": (
+                f"Взаимная симпатия с {target_client.first_name}! "
+                f"Почта: {target_client.email}"
+            )
         }
 
     return {"message": "Симпатия отправлена"}
 
 
+async def match_clients_batch_f(
+    target_client_ids: list[int],
+    current_user: Principal,
+    session: AsyncSession,
+) -> MatchBatchResult:
+    """
+    Функция создаёт записи об оценках пачкой и возвращает результат по каждому
+    целевому пользователю, о новых взаимных симпатиях ставит в очередь email обоим
+    в той же транзакции, что и сами оценки.
+    Несохраненные оценки возвращаются в лимит оценок
+    """
+    client_repo = ClientRepository(session)
+    matches = {
+        match.id: match
+        for match in await client_repo.record_matches(
+            current_user.id, target_client_ids
+        )
+    }
+
+    emails = []
+    results = []
+    for target_client_id in target_client_ids:
+        target_client = matches.get(target_client_id)
+        if target_client is None:
+            results.append(
+                MatchResult(target_id=target_client_id, status=MatchStatus.not_found)
+            )
+            continue
+        if target_client.mutual:
+            if target_client.inserted:
+                emails.extend(mutual_match_emails(current_user, target_client))
+            results.append(
+                MatchResult(
+                    target_id=target_client_id,
+                    status=MatchStatus.mutual,
+                    email=target_client.email,
+                )
+            )
+        elif target_client.inserted:
+            results.append(
+                MatchResult(target_id=target_client_id, status=MatchStatus.sent)
+            )
+        else:
+            results.append(
+                MatchResult(target_id=target_client_id, status=MatchStatus.already_sent)
+            )
+
+    enqueue_emails(session, emails)
+    await session.commit()
+    inserted = sum(1 for match in matches.values() if match.inserted)
+    await refund_ratings(current_user, len(target_client_ids) - inserted)
+    return MatchBatchResult(results=results)
+
+
 async def get_clients_f(
     session: AsyncSession,
-    current_user: Client,
-    gender: str | None,
-    first_name: str | None,
-    last_name: str | None,
-    distance: float | None,
-    created_at: datetime | None,
-) -> Sequence[Client]:
+    current_user: Principal,
+    filters: ClientFilters,
+    limit: int | None = None,
+    cursor: str | None = None,
+) -> ClientPage:
     """
-    Функция получает и возвращает отфильтрованный список пользователей
+    Функция получает и возвращает страницу отфильтрованного списка пользователей
     """
     client_repo = ClientRepository(session)
     clients = await client_repo.get_clients(
-        gender=gender,
-        current_user=current_user,
-        first_name=first_name,
-        last_name=last_name,
-        distance=distance,
-        created_at=created_at,
+        current_user=current_user, filters=filters, limit=limit, cursor=cursor
     )
     return clients
+
+
+async def stream_clients_ndjson(query: Select) -> AsyncIterator[str]:
+    """
+    Генератор построчно отдает клиентов в формате NDJSON.
+    Использует собственную сессию, так как сессия запроса закрывается
+    до окончания отправки потокового ответа
+    """
+    async with async_session() as session:
+        client_repo = ClientRepository(session)
+        async for chunk in client_repo.stream_clients(
+            query, settings.CLIENTS_EXPORT_CHUNK_SIZE
+        ):
+            yield "".join(
+                Client.model_validate(client).model_dump_json() + "\n"
+                for client in chunk
+            )
+
+
+async def export_clients_f(
+    session: AsyncSession,
+    current_user: Principal,
+    filters: ClientFilters,
+) -> AsyncIterator[str]:
+    """
+    Функция проверяет фильтры и возвращает генератор потоковой выгрузки
+    отфильтрованного списка пользователей
+    """
+    client_repo = ClientRepository(session)
+    query = await client_repo.build_clients_query(
+        filters, distance_origin(current_user, filters)
+    )
+    return stream_clients_ndjson(query)
@@ -0,0 +1,173 @@
+import asyncio
+import ipaddress
+import logging
+
+import httpx
+
+from app.core.cache import TieredCache, geo_cache
+from app.core.config import settings
+from app.db.session import async_session
+from app.geoip import GeoIPDatabase
+from app.repositories.client import ClientRepository
+
+logger = logging.getLogger(__name__)
+
+Location = tuple[float | None, float | None]
+
+
+class GeolocationError(Exception):
+    """Источник координат недоступен или вернул ошибку"""
+
+
+def ip_prefix(ip: str) -> str:
+    """
+    Возвращает сеть, к которой относится адрес: /24 для IPv4 и /48 для IPv6.
+    Адреса одной такой сети почти всегда находятся в одном месте,
+    поэтому координаты кэшируются по сети, а не по адресу
+    """
+    address = ipaddress.ip_address(ip.strip())
+    prefix = 24 if address.version == 4 else 48
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+class IpApiBackend:
+    """Координаты по ip через ip-api.com с общим пулом соединений и таймаутами"""
+
+    def __init__(self, url: str, timeout: float, max_connections: int):
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: httpx.AsyncClient | None = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+        return self._client
+
+    async def lookup(self, ip: str) -> Location:
+        try:
+            response = await self._get_client().get(self.url.format(ip=ip))
+        except httpx.HTTPError as exc:
+            raise GeolocationError(str(exc)) from exc
+        if response.status_code != 200:
+            raise GeolocationError(f"ip-api вернул {response.status_code}")
+        data = response.json()
+        if data.get("status") == "fail":
+            raise GeolocationError(f"ip-api не определил адрес: {data.get('message')}")
+        return data.get("lat"), data.get("lon")
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class LocalDatabaseBackend:
+    """Координаты по локальной базе диапазонов адресов (app.geoip) без сети"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.database: GeoIPDatabase | None = None
+
+    async def lookup(self, ip: str) -> Location:
+        if self.database is None:
+            try:
+                self.database = GeoIPDatabase(self.path)
+            except (OSError, ValueError) as exc:
+                raise GeolocationError(f"База {self.path} недоступна: {exc}") from exc
+        return self.database.lookup(ip)
+
+    async def close(self) -> None:
+        if self.database is not None:
+            self.database.close()
+            self.database = None
+
+
+class GeolocationService:
+    """
+    Определение координат клиента по ip.
+    Результаты кэшируются по сети адреса, ошибки источника не кэшируются
+    и дают пустые координаты, чтобы не мешать регистрации
+    """
+
+    def __init__(self, backend, cache: TieredCache, ttl: int):
+        self.backend = backend
+        self.cache = cache
+        self.ttl = ttl
+        self.failures = 0
+        self._fills: set[asyncio.Task] = set()
+
+    async def locate(self, ip: str) -> Location:
+        try:
+            key = f"geo:{ip_prefix(ip)}"
+        except ValueError:
+            return None, None
+
+        async def load() -> list:
+            return list(await self.backend.lookup(ip))
+
+        try:
+            latitude, longitude = await self.cache.get_or_load(key, load, ttl=self.ttl)
+        except GeolocationError as exc:
+            self.failures += 1
+            logger.warning("Не удалось определить координаты %s: %s", ip, exc)
+            return None, None
+        return latitude, longitude
+
+    async def fill_client_location(self, client_id: int, ip: str) -> None:
+        """Определяет координаты и сохраняет их уже зарегистрированному клиенту"""
+        latitude, longitude = await self.locate(ip)
+        if latitude is None or longitude is None:
+            return
+        async with async_session() as session:
+            await ClientRepository(session).update_location(
+                client_id, latitude, longitude
+            )
+
+    def schedule_fill(self, client_id: int, ip: str) -> None:
+        """Запускает заполнение координат клиента в фоне"""
+        task = asyncio.create_task(self.fill_client_location(client_id, ip))
+        self._fills.add(task)
+        task.add_done_callback(self._fill_done)
+
+    def _fill_done(self, task: asyncio.Task) -> None:
+        self._fills.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Не удалось сохранить координаты клиента", exc_info=task.exception()
+            )
+
+    async def close(self) -> None:
+        """Дожидается фоновых заполнений координат и закрывает соединения"""
+        await asyncio.gather(*self._fills, return_exceptions=True)
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "failures": self.failures,
+            "pending_fills": len(self._fills),
+            "cache": self.cache.stats(),
+        }
+
+
+def create_geolocation_backend():
+    """Создает источник координат, выбранный в настройках"""
+    if settings.GEOLOCATION_BACKEND == "local":
+        return LocalDatabaseBackend(settings.GEOLOCATION_DB_PATH)
+    return IpApiBackend(
+        settings.GEOLOCATION_URL,
+        settings.GEOLOCATION_TIMEOUT,
+        settings.GEOLOCATION_MAX_CONNECTIONS,
+    )
+
+
+geolocation = GeolocationService(
+    create_geolocation_backend(), geo_cache, settings.GEOLOCATION_CACHE_TTL
+)
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.rate_limiter import RateLimitResult, rate_limiter
+from app.repositories.client import ClientRepository
+from app.schemas.auth import Principal
+
+RATINGS_WINDOW_SECONDS = 24 * 60 * 60
+
+
+def ratings_key(client_id: int) -> str:
+    return f"ratings:{client_id}"
+
+
+async def check_ratings_in_db(
+    client_id: int, session: AsyncSession, cost: int = 1
+) -> RateLimitResult:
+    """
+    Проверяет лимит оценок по таблице match, оценка учитывается
+    при ее сохранении. Используется, если лимит не ведется в Redis
+    """
+    now = datetime.now(timezone.utc)
+    client_repo = ClientRepository(session)
+    count, oldest = await client_repo.count_ratings_by_client(
+        client_id,
+        now - timedelta(seconds=RATINGS_WINDOW_SECONDS),
+        settings.RATINGS_PER_DAY,
+    )
+    if count + cost <= settings.RATINGS_PER_DAY:
+        return RateLimitResult(True, 0)
+    if oldest is None:
+        return RateLimitResult(False, RATINGS_WINDOW_SECONDS)
+    retry_after = RATINGS_WINDOW_SECONDS - (now - oldest).total_seconds()
+    return RateLimitResult(False, max(int(retry_after) + 1, 1))
+
+
+async def charge_ratings(
+    current_user: Principal, session: AsyncSession, cost: int = 1
+) -> None:
+    """
+    Резервирует cost оценок пользователя в скользящем окне за последние сутки,
+    если оценок больше заданного количества, выбрасывает ошибку
+    с заголовком Retry-After. Оценки, которые не удалось сохранить,
+    возвращаются через refund_ratings
+    """
+    if settings.RATE_LIMIT_BACKEND == "database":
+        result = await check_ratings_in_db(current_user.id, session, cost)
+    else:
+        result = await rate_limiter.hit(
+            ratings_key(current_user.id),
+            settings.RATINGS_PER_DAY,
+            RATINGS_WINDOW_SECONDS,
+            cost,
+        )
+
+    if not result.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Достигнут лимит оценок в день. Попробуйте позже.",
+            headers={"Retry-After": str(result.retry_after)},
+        )
+
+
+async def refund_ratings(current_user: Principal, cost: int) -> None:
+    """
+    Возвращает в лимит зарезервированные оценки, которые не были сохранены:
+    цель не найдена или оценка уже была поставлена раньше.
+    В режиме database лимит считается по сохраненным оценкам, возвращать нечего
+    """
+    if cost <= 0 or settings.RATE_LIMIT_BACKEND == "database":
+        return
+    await rate_limiter.refund(ratings_key(current_user.id), cost)
@@ -1,33 +1,168 @@
-from fastapi import BackgroundTasks
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+
+import aiosmtplib
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.models.email_job import EmailJob, EmailStatusEnum
+
+logger = logging.getLogger(__name__)
+
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.MAIL_USERNAME,
-    MAIL_PASSWORD=settings.MAIL_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM,
-    MAIL_PORT=settings.MAIL_PORT,
-    MAIL_SERVER=settings.MAIL_SERVER,
-    MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
-    USE_CREDENTIALS=settings.USE_CREDENTIALS,
-    VALIDATE_CERTS=settings.VALIDATE_CERTS,
-)
-
-
-async def send_email_to_user(
-    background_tasks: BackgroundTasks,
-    user_name: str,
-    user_email: str,
-    target_user_email: str,
-) -> None:
-    """Функция для отправки письма пользователю"""
-    message_text = f"Вы понравились {user_name}! Почта участника: {user_email}"
-    message = MessageSchema(
+def build_match_email(
+    user_name: str, user_email: str, target_user_email: str
+) -> EmailJob:
+    """Функция формирует письмо пользователю о взаимной симпатии"""
+    return EmailJob(
+        recipient=target_user_email,
         subject="У вас взаимная симпатия!",
-        recipients=[target_user_email],
-        body=message_text,
-        subtype=MessageType.plain,
+        body=f"Вы понравились {user_name}! Почта участника: {user_email}",
+    )
+
+
+def enqueue_emails(session: AsyncSession, jobs: list[EmailJob]) -> None:
+    """
+    Функция добавляет письма в текущую транзакцию, они попадут в очередь
+    вместе с изменениями, ради которых отправляются. Отправку выполняет
+    воркер app.workers.email_sender
+    """
+    session.add_all(jobs)
+
+
+class SMTPConnection:
+    """
+    Переиспользуемое соединение с SMTP сервером.
+    Соединение открывается при первой отправке, закрывается после простоя
+    и переоткрывается, если сервер его разорвал
+    """
+
+    def __init__(self):
+        self.client: aiosmtplib.SMTP | None = None
+        self.last_used = 0.0
+
+    def _create_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            username=settings.MAIL_USERNAME if settings.USE_CREDENTIALS else None,
+            password=settings.MAIL_PASSWORD if settings.USE_CREDENTIALS else None,
+            use_tls=settings.MAIL_SSL_TLS,
+            start_tls=settings.MAIL_STARTTLS,
+            validate_certs=settings.VALIDATE_CERTS,
+            timeout=settings.SMTP_TIMEOUT,
+        )
+
+    async def send(self, message: EmailMessage) -> None:
+        if self.client is None or not self.client.is_connected:
+            self.client = self._create_client()
+            await self.client.connect()
+        try:
+            await self.client.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            self.client = self._create_client()
+            await self.client.connect()
+            await self.client.send_message(message)
+        self.last_used = asyncio.get_running_loop().time()
+
+    async def close_if_idle(self) -> None:
+        idle = asyncio.get_running_loop().time() - self.last_used
+        if self.client is not None and idle > settings.SMTP_IDLE_TIMEOUT:
+            await self.close()
+
+    async def close(self) -> None:
+        if self.client is not None and self.client.is_connected:
+            try:
+                await self.client.quit()
+            except aiosmtplib.SMTPException:
+                self.client.close()
+        self.client = None
+
+
+def to_message(job: EmailJob) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.MAIL_FROM
+    message["To"] = job.recipient
+    message["Subject"] = job.subject
+    message.set_content(job.body)
+    return message
+
+
+async def claim_pending_emails(session: AsyncSession) -> list[EmailJob]:
+    """
+    Функция забирает пачку писем из очереди: строки выбираются с SKIP LOCKED
+    и помечаются арендой до locked_until, после чего транзакция сразу фиксируется.
+    Пока аренда не истекла, письма не достаются другим воркерам,
+    если воркер упадет, письма вернутся в очередь после ее окончания.
+    Число попыток увеличивается при взятии письма, поэтому письмо,
+    на котором падает воркер, тоже будет помечено failed
+    """
+    now = datetime.now(timezone.utc)
+    claimed = (
+        select(EmailJob.id)
+        .where(
+            EmailJob.status == EmailStatusEnum.pending,
+            EmailJob.next_attempt_at <= now,
+            or_(EmailJob.locked_until.is_(None), EmailJob.locked_until <= now),
+        )
+        .order_by(EmailJob.next_attempt_at)
+        .limit(settings.EMAIL_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
     )
-    fm = FastMail(conf)
-    background_tasks.add_task(fm.send_message, message, template_name=None)
+    result = await session.execute(
+        update(EmailJob)
+        .where(EmailJob.id.in_(claimed.scalar_subquery()))
+        .values(
+            locked_until=now + timedelta(seconds=settings.EMAIL_LEASE_SECONDS),
+            attempts=EmailJob.attempts + 1,
+        )
+        .returning(EmailJob),
+        execution_options={"synchronize_session": False},
+    )
+    jobs = sorted(result.scalars().all(), key=lambda job: job.next_attempt_at)
+    await session.commit()
+    return jobs
+
+
+async def deliver_emails(jobs: list[EmailJob], smtp: SMTPConnection) -> None:
+    """
+    Функция отправляет письма через одно SMTP соединение и записывает результат
+    в объекты писем. Неудачные письма откладываются с экспоненциальной задержкой,
+    после EMAIL_MAX_ATTEMPTS попыток помечаются как failed
+    """
+    for job in jobs:
+        try:
+            await smtp.send(to_message(job))
+        except (aiosmtplib.SMTPException, OSError) as exc:
+            job.last_error = str(exc)
+            if job.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                job.status = EmailStatusEnum.failed
+                logger.error("Письмо %s не отправлено: %s", job.id, exc)
+            else:
+                delay = settings.EMAIL_RETRY_DELAY * 2 ** (job.attempts - 1)
+                job.next_attempt_at = datetime.now(timezone.utc) + timedelta(
+                    seconds=delay
+                )
+            await smtp.close()
+        else:
+            job.status = EmailStatusEnum.sent
+            job.sent_at = datetime.now(timezone.utc)
+        job.locked_until = None
+
+
+async def send_pending_emails(session: AsyncSession, smtp: SMTPConnection) -> int:
+    """
+    Функция отправляет пачку писем из очереди. Письма забираются короткой
+    транзакцией с арендой, отправка идет без блокировок строк,
+    результаты сохраняются отдельной транзакцией, поэтому воркеров может
+    быть несколько. Возвращает количество обработанных писем
+    """
+    jobs = await claim_pending_emails(session)
+    if not jobs:
+        return 0
+    await deliver_emails(jobs, smtp)
+    await session.commit()
+    return len(jobs)
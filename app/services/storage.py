@@ -1,67 +1,194 @@
+import hashlib
 import io
+import json
 import os
-import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
 import aiofiles
-from fastapi import UploadFile
-from PIL import Image
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, UnidentifiedImageError
 
 from app.core.config import settings
+from app.core.executor import BoundedExecutor
+from app.utils import upload_url
 
 UPLOAD_DIRECTORY = "uploads/avatars"
+AVATAR_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg"}
 
 
-async def add_watermark(avatar_path: str, watermark_path: str, output_path: str) -> str:
-    """Накладывает водяной знак на аватар и сохраняет его."""
+@lru_cache(maxsize=None)
+def load_watermark(watermark_path: str) -> Image.Image:
+    """Читает и декодирует водяной знак один раз на процесс"""
+    return Image.open(watermark_path).convert("RGBA")
 
-    avatar = Image.open(avatar_path).convert("RGBA")
-    watermark = Image.open(watermark_path).convert("RGBA")
 
-    watermark = watermark.resize(
-        (avatar.width // 5, avatar.height // 5), Image.Resampling.LANCZOS
+@lru_cache(maxsize=settings.WATERMARK_CACHE_SIZE)
+def scaled_watermark(watermark_path: str, size: tuple[int, int]) -> Image.Image:
+    """Водяной знак, уменьшенный под размер аватара. Последние размеры кэшируются"""
+    return load_watermark(watermark_path).resize(size, Image.Resampling.LANCZOS)
+
+
+def init_image_worker(watermark_path: str) -> None:
+    """Инициализатор процесса пула: заранее загружает водяной знак"""
+    load_watermark(watermark_path)
+
+
+def apply_watermark(avatar: Image.Image, watermark_path: str) -> None:
+    """Накладывает водяной знак в правый нижний угол картинки"""
+    watermark = scaled_watermark(
+        watermark_path, (max(avatar.width // 5, 1), max(avatar.height // 5, 1))
     )
     watermark_position = (
         avatar.width - watermark.width - 10,
         avatar.height - watermark.height - 10,
     )
+    avatar.paste(watermark, watermark_position, watermark)
+
+
+def save_atomic(image: Image.Image, path: str, image_format: str, quality: int) -> None:
+    """Сохраняет картинку через временный файл, чтобы не оставить недописанный файл"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp_path, format=image_format, quality=quality)
+    os.replace(tmp_path, path)
+
+
+def render_renditions(
+    data: bytes,
+    watermark_path: str,
+    outputs: dict[str, tuple[str, int]],
+    image_format: str,
+    quality: int,
+    max_dimension: int,
+) -> dict[str, str]:
+    """
+    Декодирует загруженную картинку и сохраняет её варианты разного размера
+    с водяным знаком. outputs сопоставляет имени варианта путь к файлу
+    и максимальный размер большей стороны.
+    Большие JPEG уменьшаются уже при декодировании, каждый следующий вариант
+    получается уменьшением предыдущего.
+    Выполняется в процессе пула обработки изображений
+    """
 
-    combined = Image.new("RGBA", avatar.size)
-    combined.paste(avatar, (0, 0))
-    combined.paste(watermark, watermark_position, watermark)
+    avatar = Image.open(io.BytesIO(data))
+    avatar.draft("RGB", (max_dimension, max_dimension))
+    if avatar.mode != "RGB":
+        avatar = avatar.convert("RGB")
+    avatar.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
 
-    final_image = combined.convert("RGB")
+    paths = {}
+    for name, (path, size) in sorted(
+        outputs.items(), key=lambda item: item[1][1], reverse=True
+    ):
+        avatar.thumbnail((size, size), Image.Resampling.LANCZOS)
+        rendition = avatar.copy()
+        apply_watermark(rendition, watermark_path)
+        save_atomic(rendition, path, image_format, quality)
+        paths[name] = path
 
-    async with aiofiles.open(output_path, "wb") as f:
-        img_byte_arr = io.BytesIO()
-        final_image.save(img_byte_arr, format='JPEG')
-        await f.write(img_byte_arr.getvalue())
+    return paths
 
-    return output_path
 
+image_pool = BoundedExecutor(
+    ProcessPoolExecutor,
+    settings.IMAGE_WORKERS,
+    settings.IMAGE_QUEUE_LIMIT,
+    overload_detail="Сервер перегружен обработкой изображений. Попробуйте позже.",
+    initializer=init_image_worker,
+    initargs=(settings.PATH_TO_AVATAR_WATERMARK,),
+)
 
-async def save_avatar_image(avatar: UploadFile) -> str:
+
+def rendition_outputs(digest: str) -> dict[str, tuple[str, int]]:
     """
-    Функция получает картинку, извлекает расширение, генерирует уникальное название, чтобы избежать коллизий,
-    создаёт папку для аватаров, если она не существует, асинхронно записывает файл на диск,
-    накладывает водяной знак и возвращает путь до файла.
+    Пути и размеры вариантов аватара. Имена файлов строятся по хэшу содержимого
+    вместе с параметрами вариантов, поэтому после смены размеров, качества
+    или формата варианты создаются заново, а не берутся из старых файлов
     """
-    avatar_extension: str = avatar.filename.split(".")[-1]
-    avatar_name: str = f"{uuid.uuid4()}.{avatar_extension}"
-    avatar_name_with_watermark: str = f"water_{avatar_name}"
-    avatar_path: str = os.path.join(UPLOAD_DIRECTORY, avatar_name)
-    avatar_path_with_watermark: str = os.path.join(
-        UPLOAD_DIRECTORY, avatar_name_with_watermark
+    params = json.dumps(
+        {
+            "renditions": settings.AVATAR_RENDITIONS,
+            "format": settings.AVATAR_FORMAT,
+            "quality": settings.AVATAR_QUALITY,
+            "max_dimension": settings.AVATAR_MAX_DIMENSION,
+        },
+        sort_keys=True,
     )
+    key = hashlib.sha256(f"{digest}:{params}".encode()).hexdigest()
+    extension = AVATAR_EXTENSIONS[settings.AVATAR_FORMAT]
+    return {
+        name: (os.path.join(UPLOAD_DIRECTORY, f"{key}_{name}.{extension}"), size)
+        for name, size in settings.AVATAR_RENDITIONS.items()
+    }
+
+
+async def render_avatar(
+    data: bytes, outputs: dict[str, tuple[str, int]]
+) -> dict[str, str]:
+    """Сохраняет варианты аватара с водяным знаком, обработка идёт в пуле процессов"""
+    try:
+        return await image_pool.run(
+            render_renditions,
+            data,
+            settings.PATH_TO_AVATAR_WATERMARK,
+            outputs,
+            settings.AVATAR_FORMAT,
+            settings.AVATAR_QUALITY,
+            settings.AVATAR_MAX_DIMENSION,
+        )
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Файл не является поддерживаемым изображением.",
+        )
+
+
+async def read_upload(avatar: UploadFile) -> tuple[bytes, str]:
+    """
+    Читает загруженный файл в память крупными блоками, попутно считая sha256,
+    и прерывает чтение, как только превышен допустимый размер
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail="Файл слишком большой.",
+    )
+    if avatar.size is not None and avatar.size > settings.AVATAR_MAX_UPLOAD_SIZE:
+        raise too_large
 
-    os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
+    data = bytearray()
+    digest = hashlib.sha256()
+    while content := await avatar.read(settings.UPLOAD_CHUNK_SIZE):
+        data += content
+        if len(data) > settings.AVATAR_MAX_UPLOAD_SIZE:
+            raise too_large
+        digest.update(content)
+    return bytes(data), digest.hexdigest()
 
-    async with aiofiles.open(avatar_path, "wb") as out_file:
-        while content := await avatar.read(1024):
-            await out_file.write(content)
 
-    watermark_path = settings.PATH_TO_AVATAR_WATERMARK
+async def save_avatar_image(avatar: UploadFile) -> dict[str, str]:
+    """
+    Функция читает картинку в память с проверкой размера и сохраняет её варианты
+    (например, миниатюру, средний и полный размер) с водяным знаком.
+    Файлы называются по хэшу содержимого, поэтому одинаковые загрузки хранятся
+    один раз и повторно не обрабатываются. Возвращает адреса вариантов /uploads/...
+    Исходный файл сохраняется, только если включена настройка KEEP_ORIGINAL_AVATARS.
+    """
+    data, digest = await read_upload(avatar)
+    outputs = rendition_outputs(digest)
+    os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
-    file_with_watermark_path = await add_watermark(
-        avatar_path, watermark_path, avatar_path_with_watermark
-    )
-    return file_with_watermark_path
+    if all(os.path.exists(path) for path, _ in outputs.values()):
+        paths = {name: path for name, (path, _) in outputs.items()}
+    else:
+        paths = await render_avatar(data, outputs)
+
+    if settings.KEEP_ORIGINAL_AVATARS:
+        avatar_extension: str = avatar.filename.split(".")[-1]
+        avatar_path: str = os.path.join(
+            UPLOAD_DIRECTORY, f"{digest}_original.{avatar_extension}"
+        )
+        if not os.path.exists(avatar_path):
+            async with aiofiles.open(avatar_path, "wb") as out_file:
+                await out_file.write(data)
+
+    return {name: upload_url(path) for name, path in paths.items()}
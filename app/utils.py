@@ -1,32 +1,108 @@
-import httpx
+import base64
+import binascii
+import math
+import re
+from datetime import datetime, timezone
+
 from geopy.distance import great_circle
 
+# Радиус Земли в км, совпадает с тем, что использует geopy.great_circle
+EARTH_RADIUS_KM = 6371.009
+
+# Имя файла варианта аватара: <sha256 содержимого и параметров>_<вариант>.<расширение>
+AVATAR_RENDITION_PATTERN = re.compile(
+    r"(?P<digest>[0-9a-f]{64})_(?P<name>[a-z0-9]+)\.(?P<extension>\w+)$"
+)
+
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Вычисляет расстояние в километрах между двумя точками на земном шаре."""
     return great_circle((lat1, lon1), (lat2, lon2)).km
 
 
-async def get_location(client_ip: str) -> tuple:
+def bounding_box(
+    latitude: float, longitude: float, distance: float
+) -> tuple[float, float, float | None, float | None]:
+    """
+    Возвращает прямоугольник (min_lat, max_lat, min_lon, max_lon), который содержит
+    все точки, лежащие не дальше distance км от заданной.
+    Если min_lon > max_lon, прямоугольник пересекает 180-й меридиан.
+    Если окрестность захватывает полюс, долгота не ограничена
+    и min_lon, max_lon равны None
+    """
+    # небольшой запас, чтобы погрешность округления не отсекала точки на границе
+    angular = distance / EARTH_RADIUS_KM + 1e-9
+    lat = math.radians(latitude)
+    min_lat = math.degrees(lat - angular)
+    max_lat = math.degrees(lat + angular)
+
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+
+    ratio = math.sin(angular) / math.cos(lat)
+    if ratio >= 1:
+        return min_lat, max_lat, None, None
+
+    delta_lon = math.degrees(math.asin(ratio))
+    min_lon = longitude - delta_lon
+    max_lon = longitude + delta_lon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def as_utc(value: datetime) -> datetime:
+    """Приводит дату к UTC, дата без часового пояса считается датой в UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def escape_like(value: str) -> str:
+    """Экранирует спецсимволы шаблона LIKE в пользовательском вводе"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def upload_url(path: str) -> str:
     """
-    Функция получает широту и долготу по ip, если запрос неудачен,
-    возвращает пустой кортеж
+    Возвращает адрес файла из папки uploads, под которым его отдает приложение.
+    Внешние адреса и уже абсолютные пути возвращаются без изменений
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"http://ip-api.com/json/{client_ip}")
-        if response.status_code == 200:
-            data = response.json()
-            latitude = data.get("lat")
-            longitude = data.get("lon")
-            return latitude, longitude
-        return None, None
+    if path.startswith("uploads/"):
+        return f"/{path}"
+    return path
 
 
-def my_key_builder(func, *args, **kwargs) -> str:
-    """Создаем динамический ключ на основе имени функции и её аргументов"""
-    key_parts = (
-        [func.__module__, func.__name__]
-        + list(args)
-        + [f"{k}={v}" for k, v in kwargs.items()]
-    )
-    return ":".join(map(str, key_parts))
+def avatar_rendition(avatar: str | None, name: str) -> str | None:
+    """
+    Возвращает адрес варианта name того же аватара.
+    Для аватаров, сохранённых без вариантов, возвращается сам аватар
+    """
+    if not avatar:
+        return None
+    match = AVATAR_RENDITION_PATTERN.search(avatar)
+    if match is None:
+        return upload_url(avatar)
+    prefix = avatar[: match.start()]
+    return upload_url(f"{prefix}{match['digest']}_{name}.{match['extension']}")
+
+
+def encode_cursor(created_at: datetime, client_id: int) -> str:
+    """Кодирует позицию последнего клиента на странице в курсор"""
+    raw = f"{created_at.isoformat()}|{client_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Декодирует курсор в пару (created_at, id),
+    если курсор поврежден, выбрасывает ValueError
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, client_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(client_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Некорректный курсор") from exc
@@ -0,0 +1,37 @@
+"""
+Воркер отправки писем из очереди email_outbox.
+
+Запуск: python -m app.workers.email_sender
+"""
+
+import asyncio
+import logging
+
+from app.core.config import settings
+from app.db.session import async_session
+from app.services.send_email import SMTPConnection, send_pending_emails
+
+logger = logging.getLogger(__name__)
+
+
+async def run() -> None:
+    """Обрабатывает очередь писем, пока процесс не будет остановлен"""
+    smtp = SMTPConnection()
+    try:
+        while True:
+            try:
+                async with async_session() as session:
+                    processed = await send_pending_emails(session, smtp)
+            except Exception:
+                logger.exception("Ошибка обработки очереди писем")
+                processed = 0
+            if processed < settings.EMAIL_BATCH_SIZE:
+                await smtp.close_if_idle()
+                await asyncio.sleep(settings.EMAIL_POLL_INTERVAL)
+    finally:
+        await smtp.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
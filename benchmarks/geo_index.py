@@ -0,0 +1,60 @@
+"""
+Сравнение фильтра по расстоянию: цикл с geopy.great_circle на каждого клиента
+против индекса координат в памяти (app.geo.GeoIndex).
+
+Запуск: python -m benchmarks.geo_index [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.geo import GeoIndex
+from app.utils import calculate_distance
+
+
+def run(size: int, distance: float, queries: int, seed: int = 42) -> None:
+    rng = np.random.default_rng(seed)
+    latitudes = rng.uniform(-60, 70, size)
+    longitudes = rng.uniform(-180, 180, size)
+    centers = list(zip(rng.uniform(-60, 70, queries), rng.uniform(-180, 180, queries)))
+
+    started = time.perf_counter()
+    index = GeoIndex()
+    index.extend(zip(range(1, size + 1), latitudes.tolist(), longitudes.tolist()))
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    indexed = [index.query_radius(lat, lon, distance) for lat, lon in centers]
+    index_time = (time.perf_counter() - started) / queries
+
+    lat, lon = centers[0]
+    started = time.perf_counter()
+    looped = [
+        client_id
+        for client_id, client_lat, client_lon in zip(
+            range(1, size + 1), latitudes.tolist(), longitudes.tolist()
+        )
+        if calculate_distance(lat, lon, client_lat, client_lon) <= distance
+    ]
+    loop_time = time.perf_counter() - started
+
+    assert sorted(indexed[0].tolist()) == looped
+    print(
+        f"{size:>9} точек: цикл geopy {loop_time * 1000:10.1f} мс, "
+        f"индекс {index_time * 1000:8.3f} мс на запрос "
+        f"(построение {build_time:.2f} с, найдено {len(looped)})"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--distance", type=float, default=100.0)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.distance, args.queries)
@@ -0,0 +1,55 @@
+"""
+Время поиска координат по ip в локальной базе app.geoip.
+
+Запуск: python -m benchmarks.geoip [--ranges 200000] [--lookups 100000]
+"""
+
+import argparse
+import ipaddress
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from app.geoip import GeoIPDatabase, build
+
+
+def main(ranges: int, lookups: int) -> None:
+    bounds = np.sort(
+        np.random.default_rng(1).choice(2**32, size=ranges * 2, replace=False)
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "ranges.csv")
+        with open(source, "w") as csv_file:
+            for start, end in bounds.reshape(-1, 2):
+                csv_file.write(
+                    f"{ipaddress.IPv4Address(int(start))},"
+                    f"{ipaddress.IPv4Address(int(end))},"
+                    f"{random.uniform(-90, 90):.4f},{random.uniform(-180, 180):.4f}\n"
+                )
+
+        output = os.path.join(directory, "geoip.bin")
+        started = time.perf_counter()
+        build(source, output)
+        print(f"сборка: {time.perf_counter() - started:.1f} с, {ranges} диапазонов")
+
+        database = GeoIPDatabase(output)
+        addresses = [
+            str(ipaddress.IPv4Address(random.randrange(2**32))) for _ in range(lookups)
+        ]
+        started = time.perf_counter()
+        found = sum(database.lookup(ip)[0] is not None for ip in addresses)
+        elapsed = (time.perf_counter() - started) / lookups
+        database.close()
+
+    print(f"поиск: {elapsed * 1e6:.2f} мкс на адрес, найдено {found} из {lookups}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ranges", type=int, default=200000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.ranges, args.lookups)
@@ -0,0 +1,77 @@
+"""
+Задержка /api/list во время всплеска логинов.
+Скрипт работает с запущенным приложением: сначала меряет задержку списка
+клиентов без нагрузки, затем одновременно с параллельными запросами логина,
+каждый из которых проверяет bcrypt хэш пароля.
+
+Запуск: python -m benchmarks.login_load --token <access token>
+        --email <email> --password <пароль> [--url http://localhost:8000]
+        [--logins 200] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.upload_load import percentiles, poll_list
+
+
+async def login(
+    client: httpx.AsyncClient, email: str, password: str, semaphore: asyncio.Semaphore
+) -> int:
+    async with semaphore:
+        response = await client.post(
+            "/api/clients/login/", json={"email": email, "password": password}
+        )
+        return response.status_code
+
+
+async def main(
+    url: str, token: str, email: str, password: str, logins: int, concurrency: int
+) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=url, headers=headers, timeout=120) as client:
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_list(client, stop))
+        await asyncio.sleep(3)
+        stop.set()
+        print(f"без логинов:  {percentiles(await poller)}")
+
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_list(client, stop))
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        codes = await asyncio.gather(
+            *(login(client, email, password, semaphore) for _ in range(logins))
+        )
+        elapsed = time.perf_counter() - started
+        stop.set()
+        print(f"при логинах:  {percentiles(await poller)}")
+
+        summary = {code: codes.count(code) for code in sorted(set(codes))}
+        print(f"логины: {logins} за {elapsed:.1f} с, коды ответов {summary}")
+        metrics = await client.get("/api/metrics")
+        print(f"пул паролей: {metrics.json().get('password_pool')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            args.url,
+            args.token,
+            args.email,
+            args.password,
+            args.logins,
+            args.concurrency,
+        )
+    )
@@ -0,0 +1,66 @@
+"""
+План и время поиска по имени до и после trigram-индексов.
+
+Скрипт в одной транзакции наполняет таблицу clients тестовыми строками,
+выполняет EXPLAIN ANALYZE для поиска по подстроке и по началу имени
+с индексами и без них (индексы удаляются внутри той же транзакции),
+после чего откатывает все изменения.
+
+Запуск: python -m benchmarks.name_search [--rows 500000]
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from app.db.session import engine
+
+INDEXES = (
+    "ix_clients_first_name_trgm",
+    "ix_clients_first_name_lower_pattern",
+)
+
+QUERIES = {
+    "подстрока": "SELECT id FROM clients WHERE first_name ILIKE '%a3f0%' LIMIT 50",
+    "начало": "SELECT id FROM clients WHERE lower(first_name) LIKE 'a3f0%' LIMIT 50",
+}
+
+
+async def explain(conn, title: str) -> None:
+    print(f"=== {title}")
+    for name, query in QUERIES.items():
+        result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"))
+        print(f"--- {name}")
+        print("\n".join(row[0] for row in result))
+
+
+async def main(rows: int) -> None:
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            await conn.execute(
+                text(
+                    "INSERT INTO clients (gender, first_name, last_name, email) "
+                    "SELECT 'male', md5(i::text), md5((i * 7)::text), "
+                    "'bench_' || i || '@example.com' "
+                    "FROM generate_series(1, :rows) AS i"
+                ),
+                {"rows": rows},
+            )
+            await conn.execute(text("ANALYZE clients"))
+            await explain(conn, "с индексами")
+
+            for index in INDEXES:
+                await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+            await explain(conn, "без индексов")
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
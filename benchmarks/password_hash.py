@@ -0,0 +1,40 @@
+"""
+Время хэширования и проверки пароля bcrypt для разных значений стоимости
+(PASSWORD_BCRYPT_ROUNDS), чтобы подобрать её под бюджет CPU на логин.
+
+Запуск: python -m benchmarks.password_hash [--rounds 10,11,12,13] [--iterations 5]
+"""
+
+import argparse
+import time
+
+from passlib.context import CryptContext
+
+
+def main(rounds: list[int], iterations: int) -> None:
+    for cost in rounds:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=cost)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            hashed = context.hash("benchmark-password")
+        hash_time = (time.perf_counter() - started) / iterations
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            context.verify("benchmark-password", hashed)
+        verify_time = (time.perf_counter() - started) / iterations
+
+        print(
+            f"rounds={cost:2d}: хэширование {hash_time * 1000:8.1f} мс, "
+            f"проверка {verify_time * 1000:8.1f} мс, "
+            f"до {1 / verify_time:6.1f} логинов в секунду на поток"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", default="10,11,12,13")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+    main([int(cost) for cost in args.rounds.split(",")], args.iterations)
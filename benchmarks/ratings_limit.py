@@ -0,0 +1,76 @@
+"""
+План и время проверки лимита оценок и взаимной симпатии до и после индексов match.
+
+Скрипт в одной транзакции наполняет таблицу match тестовыми оценками
+(повторные пары пропускаются из-за уникальности симпатии, поэтому строк
+немного меньше --rows),
+выполняет EXPLAIN ANALYZE для подсчета оценок пользователя за сутки
+и для проверки взаимной симпатии с индексами и без них (индексы удаляются
+внутри той же транзакции), после чего откатывает все изменения.
+VACUUM внутри транзакции недоступен, поэтому index-only scan может
+обращаться к таблице (Heap Fetches) - на рабочей базе это делает autovacuum.
+
+Запуск: python -m benchmarks.ratings_limit [--rows 5000000] [--clients 100000]
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import text
+
+from app.db.session import engine
+
+INDEXES = ("ix_match_client_id_created_at", "ix_match_target_id_client_id")
+
+QUERIES = {
+    "лимит оценок": (
+        "SELECT count(*), min(created_at) FROM ("
+        "SELECT created_at FROM match WHERE client_id = 42 "
+        "AND created_at >= now() - interval '1 day' "
+        "ORDER BY created_at LIMIT 100) AS recent"
+    ),
+    "взаимная симпатия": (
+        "SELECT EXISTS (SELECT 1 FROM match WHERE client_id = 43 AND target_id = 42)"
+    ),
+}
+
+
+async def explain(conn, title: str) -> None:
+    print(f"=== {title}")
+    for name, query in QUERIES.items():
+        result = await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"))
+        print(f"--- {name}")
+        print("\n".join(row[0] for row in result))
+
+
+async def main(rows: int, clients: int) -> None:
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            await conn.execute(
+                text(
+                    "INSERT INTO match (client_id, target_id, created_at) "
+                    "SELECT (random() * :clients)::int, (random() * :clients)::int, "
+                    "now() - random() * interval '30 days' "
+                    "FROM generate_series(1, :rows) "
+                    "ON CONFLICT (client_id, target_id) DO NOTHING"
+                ),
+                {"rows": rows, "clients": clients},
+            )
+            await conn.execute(text("ANALYZE match"))
+            await explain(conn, "с индексами")
+
+            for index in INDEXES:
+                await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+            await explain(conn, "без индексов")
+        finally:
+            await transaction.rollback()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--clients", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.clients))
@@ -0,0 +1,45 @@
+"""
+Стоимость декодирования access токена на запрос с кэшем проверенных токенов и без него.
+
+Запуск: python -m benchmarks.token_cache [--requests 100000] [--tokens 1000]
+"""
+
+import argparse
+import random
+import time
+
+import jwt
+
+from app.core.config import settings
+from app.core.security import TokenCache
+from app.services.auth import create_access_token
+
+
+def main(requests: int, tokens: int) -> None:
+    pool = [
+        create_access_token(user_id, {"name": "Bench", "email": "bench@example.com"})
+        for user_id in range(1, tokens + 1)
+    ]
+    sequence = [random.choice(pool) for _ in range(requests)]
+
+    started = time.perf_counter()
+    for token in sequence:
+        jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    plain = (time.perf_counter() - started) / requests
+
+    cache = TokenCache(max_size=tokens, ttl=300)
+    started = time.perf_counter()
+    for token in sequence:
+        cache.decode(token, settings.SECRET_KEY)
+    cached = (time.perf_counter() - started) / requests
+
+    print(f"без кэша: {plain * 1e6:8.2f} мкс на запрос")
+    print(f"с кэшем:  {cached * 1e6:8.2f} мкс на запрос ({cache.stats()})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--tokens", type=int, default=1_000)
+    args = parser.parse_args()
+    main(args.requests, args.tokens)
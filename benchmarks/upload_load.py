@@ -0,0 +1,105 @@
+"""
+Задержка /api/list во время параллельной загрузки аватаров.
+Скрипт работает с запущенным приложением: сначала меряет задержку списка
+клиентов без нагрузки, затем одновременно с потоком загрузок больших картинок.
+
+Запуск: python -m benchmarks.upload_load --token <access token>
+        [--url http://localhost:8000] [--uploads 50] [--concurrency 8]
+        [--size 3000]
+"""
+
+import argparse
+import asyncio
+import io
+import statistics
+import time
+
+import httpx
+from PIL import Image, ImageDraw
+
+
+def make_images(size: int, count: int) -> list[bytes]:
+    """
+    Картинки с одинаковым шумом и номером, нарисованным в углу.
+    Содержимое у всех разное, поэтому дедупликация по хэшу
+    не пропускает обработку повторных загрузок
+    """
+    noise = Image.effect_noise((size, size), 64).convert("RGB")
+    images = []
+    for number in range(count):
+        image = noise.copy()
+        ImageDraw.Draw(image).text((10, 10), str(number), fill=(255, 0, 0))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def percentiles(samples: list[float]) -> str:
+    if not samples:
+        return "нет данных"
+    quantiles = (
+        statistics.quantiles(samples, n=100) if len(samples) > 1 else samples * 99
+    )
+    return (
+        f"p50 {quantiles[49] * 1000:7.1f} мс, p95 {quantiles[94] * 1000:7.1f} мс, "
+        f"max {max(samples) * 1000:7.1f} мс ({len(samples)} запросов)"
+    )
+
+
+async def poll_list(client: httpx.AsyncClient, stop: asyncio.Event) -> list[float]:
+    samples = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/api/list", params={"limit": 20})
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def upload(
+    client: httpx.AsyncClient, image: bytes, semaphore: asyncio.Semaphore
+) -> int:
+    async with semaphore:
+        response = await client.post(
+            "/api/storage/upload",
+            files={"avatar": ("avatar.jpg", image, "image/jpeg")},
+        )
+        return response.status_code
+
+
+async def main(url: str, token: str, uploads: int, concurrency: int, size: int) -> None:
+    images = make_images(size, uploads)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=url, headers=headers, timeout=120) as client:
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_list(client, stop))
+        await asyncio.sleep(3)
+        stop.set()
+        print(f"без загрузок:   {percentiles(await poller)}")
+
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_list(client, stop))
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        codes = await asyncio.gather(
+            *(upload(client, image, semaphore) for image in images)
+        )
+        elapsed = time.perf_counter() - started
+        stop.set()
+        print(f"при загрузках:  {percentiles(await poller)}")
+
+        summary = {code: codes.count(code) for code in sorted(set(codes))}
+        print(f"загрузки: {uploads} за {elapsed:.1f} с, коды ответов {summary}")
+        metrics = await client.get("/api/metrics")
+        print(f"пул изображений: {metrics.json().get('image_pool')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size", type=int, default=3000)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.token, args.uploads, args.concurrency, args.size))
@@ -0,0 +1,93 @@
+"""
+Время обработки одной загрузки: исходный конвейер (копия файла на диск,
+повторное чтение, знак читается и масштабируется на каждый запрос, холст RGBA)
+против обработки в памяти с декодированным один раз знаком и кэшем размеров.
+
+Запуск: python -m benchmarks.watermark [--uploads 50] [--sizes 800,1280,3000]
+        [--watermark path/to/watermark.png]
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+from app.core.config import settings
+from app.services.storage import render_renditions
+
+
+def render_legacy(data: bytes, watermark_path: str, output_path: str) -> None:
+    avatar_path = output_path + ".orig"
+    with open(avatar_path, "wb") as out_file:
+        for start in range(0, len(data), 1024):
+            end = start + 1024
+            out_file.write(data[start:end])
+
+    avatar = Image.open(avatar_path).convert("RGBA")
+    watermark = Image.open(watermark_path).convert("RGBA")
+    watermark = watermark.resize(
+        (avatar.width // 5, avatar.height // 5), Image.Resampling.LANCZOS
+    )
+    position = (
+        avatar.width - watermark.width - 10,
+        avatar.height - watermark.height - 10,
+    )
+    combined = Image.new("RGBA", avatar.size)
+    combined.paste(avatar, (0, 0))
+    combined.paste(watermark, position, watermark)
+    buffer = io.BytesIO()
+    combined.convert("RGB").save(buffer, format='JPEG')
+    with open(output_path, "wb") as out_file:
+        out_file.write(buffer.getvalue())
+
+
+def render_in_memory(data: bytes, watermark_path: str, output_path: str) -> None:
+    render_renditions(
+        data,
+        watermark_path,
+        {"full": (output_path, settings.AVATAR_MAX_DIMENSION)},
+        "JPEG",
+        75,
+        settings.AVATAR_MAX_DIMENSION,
+    )
+
+
+def measure(render, avatars: list[bytes], watermark: str, output: str) -> float:
+    started = time.perf_counter()
+    for avatar in avatars:
+        render(avatar, watermark, output)
+    return (time.perf_counter() - started) / len(avatars)
+
+
+def main(uploads: int, sizes: list[int], watermark: str | None) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        if watermark is None:
+            watermark = os.path.join(directory, "watermark.png")
+            Image.effect_noise((1024, 512), 64).convert("RGBA").save(watermark)
+
+        avatars = []
+        for size in sizes:
+            path = os.path.join(directory, f"avatar_{size}.jpg")
+            Image.effect_noise((size, size * 3 // 4), 64).convert("RGB").save(path)
+            with open(path, "rb") as avatar_file:
+                avatars.append(avatar_file.read())
+        sequence = [avatars[i % len(avatars)] for i in range(uploads)]
+        output = os.path.join(directory, "out.jpg")
+
+        legacy = measure(render_legacy, sequence, watermark, output)
+        in_memory = measure(render_in_memory, sequence, watermark, output)
+
+    print(f"исходный конвейер: {legacy * 1000:8.2f} мс на загрузку")
+    print(f"обработка в памяти: {in_memory * 1000:8.2f} мс на загрузку")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--sizes", default="800,1280,3000")
+    parser.add_argument("--watermark", default=None)
+    args = parser.parse_args()
+    main(args.uploads, [int(size) for size in args.sizes.split(",")], args.watermark)
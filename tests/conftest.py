@@ -0,0 +1,26 @@
+import os
+
+# Обязательные настройки, чтобы app.core.config импортировался без .env
+for name, value in {
+    "POSTGRES_DB": "test",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_HOST": "localhost",
+    "PATH_TO_AVATAR_WATERMARK": "media/watermarks/watermark_a.png",
+    "SECRET_KEY": "test",
+    "REFRESH_SECRET_KEY": "test-refresh",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REFRESH_TOKEN_EXPIRE_MINUTES": "60",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "noreply@example.com",
+    "MAIL_PORT": "25",
+    "MAIL_SERVER": "localhost",
+    "MAIL_STARTTLS": "false",
+    "MAIL_SSL_TLS": "false",
+    "USE_CREDENTIALS": "false",
+    "VALIDATE_CERTS": "false",
+    "RATINGS_PER_DAY": "10",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,113 @@
+import asyncio
+
+from app.core.cache import CacheGenerations, LocalCache, TieredCache
+
+
+class BrokenCache:
+    """Общий кэш, который ведет себя как недоступный Redis"""
+
+    async def get(self, key):
+        raise ConnectionError("redis is down")
+
+    async def set(self, key, value, ttl=None):
+        raise ConnectionError("redis is down")
+
+    async def delete(self, key):
+        raise ConnectionError("redis is down")
+
+    async def multi_get(self, keys, loads_fn=None):
+        raise ConnectionError("redis is down")
+
+    async def increment(self, key):
+        raise ConnectionError("redis is down")
+
+
+class MemoryCache:
+    """Общий кэш в словаре, считает обращения"""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+
+    async def get(self, key):
+        self.calls += 1
+        return self.data.get(key)
+
+    async def set(self, key, value, ttl=None):
+        self.calls += 1
+        self.data[key] = value
+
+    async def multi_get(self, keys, loads_fn=None):
+        self.calls += 1
+        return [loads_fn(self.data.get(key)) for key in keys]
+
+    async def increment(self, key):
+        self.calls += 1
+        self.data[key] = self.data.get(key, 0) + 1
+
+
+def test_get_or_load_falls_back_to_loader_when_shared_cache_fails():
+    cache = TieredCache(BrokenCache(), LocalCache(16), local_ttl=60)
+
+    async def load():
+        return {"value": 1}
+
+    assert asyncio.run(cache.get_or_load("key", load, ttl=60)) == {"value": 1}
+    assert cache.stats()["errors"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_delete_and_bump_ignore_shared_cache_errors():
+    cache = TieredCache(BrokenCache(), LocalCache(16), local_ttl=60)
+    generations = CacheGenerations(BrokenCache(), LocalCache(16), local_ttl=1)
+
+    async def run():
+        await cache.delete("key")
+        await generations.bump(["gender:*"])
+        return await generations.get(["gender:*"])
+
+    assert asyncio.run(run()) == [0]
+    assert cache.stats()["errors"] == 1
+    assert generations.stats()["errors"] == 2
+
+
+def test_cancelled_load_is_retried_by_waiter():
+    cache = TieredCache(MemoryCache(), LocalCache(16), local_ttl=60)
+    started = asyncio.Event()
+    loads = []
+
+    async def slow_load():
+        loads.append("slow")
+        started.set()
+        await asyncio.sleep(10)
+
+    async def fast_load():
+        loads.append("fast")
+        return "value"
+
+    async def run():
+        owner = asyncio.create_task(cache.get_or_load("key", slow_load, ttl=60))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_load("key", fast_load, ttl=60))
+        await asyncio.sleep(0)
+        owner.cancel()
+        return await waiter, owner.cancelled()
+
+    assert asyncio.run(run()) == ("value", True)
+    assert loads == ["slow", "fast"]
+
+
+def test_generations_are_read_from_local_tier_until_bump():
+    shared = MemoryCache()
+    generations = CacheGenerations(shared, LocalCache(16), local_ttl=60)
+
+    async def run():
+        first = await generations.get(["a", "b"])
+        calls = shared.calls
+        second = await generations.get(["a", "b"])
+        assert shared.calls == calls
+        await generations.bump(["a"])
+        third = await generations.get(["a", "b"])
+        return first, second, third
+
+    assert asyncio.run(run()) == ([0, 0], [0, 0], [1, 0])
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine, select, text
+
+from app.models.client import Client
+from app.repositories.client import distance_condition
+from app.utils import calculate_distance
+
+# Точки отсчета рядом с 180-м меридианом и полюсами, где bounding_box
+# переворачивает или снимает ограничение по долготе
+ORIGINS = [
+    (0.0, 0.0),
+    (55.75, 37.62),
+    (0.0, 179.9),
+    (-12.0, -179.95),
+    (65.0, 179.5),
+    (89.5, 10.0),
+    (-89.9, -170.0),
+    (84.0, -120.0),
+]
+DISTANCES = [1.0, 50.0, 500.0, 3000.0]
+
+
+def random_points(count: int, seed: int = 7) -> list[tuple[int, float, float]]:
+    """Случайные точки по всему шару и сгущения около точек отсчета"""
+    rng = random.Random(seed)
+    points = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(count // 2)]
+    for latitude, longitude in ORIGINS:
+        for _ in range(count // (2 * len(ORIGINS))):
+            lat = min(max(latitude + rng.gauss(0, 3), -90.0), 90.0)
+            lon = (longitude + rng.gauss(0, 5) + 180) % 360 - 180
+            points.append((lat, lon))
+    return [(number, lat, lon) for number, (lat, lon) in enumerate(points, 1)]
+
+
+@pytest.fixture(scope="module")
+def clients_db():
+    """
+    Таблица clients в SQLite: условие то же, что уходит в Postgres,
+    математические функции SQLite совпадают по смыслу
+    """
+    engine = create_engine("sqlite://")
+    points = random_points(20000)
+    with engine.begin() as connection:
+        connection.execute(
+            text("CREATE TABLE clients (id INTEGER, latitude REAL, longitude REAL)")
+        )
+        connection.execute(
+            text("INSERT INTO clients VALUES (:id, :latitude, :longitude)"),
+            [
+                {"id": number, "latitude": lat, "longitude": lon}
+                for number, lat, lon in points
+            ],
+        )
+    yield engine, points
+    engine.dispose()
+
+
+@pytest.mark.parametrize("origin", ORIGINS)
+@pytest.mark.parametrize("distance", DISTANCES)
+def test_distance_condition_matches_geopy(clients_db, origin, distance):
+    engine, points = clients_db
+    latitude, longitude = origin
+
+    with engine.connect() as connection:
+        found = set(
+            connection.scalars(
+                select(Client.id).where(
+                    distance_condition(latitude, longitude, distance)
+                )
+            )
+        )
+
+    expected = {
+        number
+        for number, lat, lon in points
+        if calculate_distance(latitude, longitude, lat, lon) <= distance
+    }
+    assert found == expected
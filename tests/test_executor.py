@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.executor import BoundedExecutor
+
+
+def double(value: int) -> int:
+    return value * 2
+
+
+def test_tasks_above_max_pending_are_rejected():
+    pool = BoundedExecutor(ThreadPoolExecutor, 1, 2, overload_detail="Занято")
+    release = threading.Event()
+
+    async def run():
+        tasks = [asyncio.create_task(pool.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as error:
+            await pool.run(double, 1)
+        stats = pool.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+        return error.value, stats
+
+    try:
+        error, stats = asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert error.status_code == 503
+    assert error.detail == "Занято"
+    assert error.headers == {"Retry-After": "1"}
+    assert (stats["running"], stats["queued"], stats["rejected"]) == (1, 1, 1)
+    assert pool.stats()["completed"] == 2
+    assert pool.stats()["running"] == pool.stats()["queued"] == 0
+
+
+def test_stats_split_wait_and_run_time():
+    pool = BoundedExecutor(ThreadPoolExecutor, 1, 10)
+
+    async def run():
+        return await asyncio.gather(*(pool.run(time.sleep, 0.05) for _ in range(3)))
+
+    try:
+        asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    stats = pool.stats()
+    assert stats["completed"] == 3
+    assert stats["run_avg"] >= 0.05
+    # Третья задача ждет, пока выполнятся две первые
+    assert stats["wait_max"] >= 0.09
+
+
+def test_failed_task_is_counted_and_raised():
+    pool = BoundedExecutor(ThreadPoolExecutor, 1, 10)
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(pool.run(int, "not a number"))
+    finally:
+        pool.shutdown()
+
+    assert (pool.stats()["failed"], pool.stats()["completed"]) == (1, 0)
+
+
+def test_process_pool_is_created_on_first_task():
+    pool = BoundedExecutor(ProcessPoolExecutor, 1, 10)
+    assert pool._executor is None
+
+    try:
+        assert asyncio.run(pool.run(double, 21)) == 42
+    finally:
+        pool.shutdown()
+
+    assert pool._executor is None
+    assert pool.stats()["completed"] == 1
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.core import rate_limiter
+from app.core.rate_limiter import MemoryRateLimiter, RateLimitResult
+
+
+class Clock:
+    """Управляемое время для rate_limiter.time.time"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "time", clock.time)
+    return clock
+
+
+def hit(limiter, key="user", limit=3, window=60, cost=1) -> RateLimitResult:
+    return asyncio.run(limiter.hit(key, limit, window, cost))
+
+
+def test_hits_within_limit_are_allowed(clock):
+    limiter = MemoryRateLimiter()
+
+    assert [hit(limiter).allowed for _ in range(3)] == [True, True, True]
+    assert hit(limiter) == RateLimitResult(False, 60)
+
+
+def test_retry_after_counts_until_the_needed_attempt_leaves_window(clock):
+    limiter = MemoryRateLimiter()
+    hit(limiter)
+    clock.now += 10
+    hit(limiter)
+    clock.now += 10
+    hit(limiter)
+
+    clock.now += 5
+    assert hit(limiter) == RateLimitResult(False, 35)
+    assert hit(limiter, cost=2) == RateLimitResult(False, 45)
+
+
+def test_window_slides(clock):
+    limiter = MemoryRateLimiter()
+    for _ in range(3):
+        hit(limiter)
+
+    clock.now += 59.5
+    assert not hit(limiter).allowed
+    clock.now += 0.5
+    assert hit(limiter).allowed
+
+
+def test_cost_above_limit_is_rejected_for_whole_window(clock):
+    limiter = MemoryRateLimiter()
+
+    assert hit(limiter, cost=4) == RateLimitResult(False, 60)
+    assert "user" not in limiter._hits
+
+
+def test_refund_returns_attempts_and_drops_empty_key(clock):
+    limiter = MemoryRateLimiter()
+    for _ in range(3):
+        hit(limiter)
+
+    asyncio.run(limiter.refund("user", 2))
+    assert hit(limiter, cost=2).allowed
+    assert not hit(limiter).allowed
+
+    asyncio.run(limiter.refund("user", 10))
+    assert "user" not in limiter._hits
+    asyncio.run(limiter.refund("unknown", 1))
+
+
+def test_sweep_drops_idle_keys(clock):
+    limiter = MemoryRateLimiter(sweep_interval=30)
+    hit(limiter, key="idle", window=10)
+    hit(limiter, key="active", window=100)
+
+    clock.now += 31
+    hit(limiter, key="other", window=100)
+    assert sorted(limiter._hits) == ["active", "other"]
@@ -0,0 +1,160 @@
+import asyncio
+import itertools
+import socket
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.core.config import settings
+from app.models.email_job import EmailJob, EmailStatusEnum
+from app.services.send_email import SMTPConnection, deliver_emails, send_pending_emails
+
+
+class RecordingHandler:
+    """SMTP заглушка: запоминает письма и отклоняет адреса bounce@"""
+
+    def __init__(self):
+        self.messages = []
+        self.on_data = None
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bounce@"):
+            return "550 Mailbox unavailable"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.on_data is not None:
+            self.on_data()
+        self.messages.append(envelope)
+        return "250 Message accepted"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_stub(monkeypatch):
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setattr(settings, "MAIL_SERVER", controller.hostname)
+    monkeypatch.setattr(settings, "MAIL_PORT", controller.port)
+    monkeypatch.setattr(settings, "MAIL_STARTTLS", False)
+    monkeypatch.setattr(settings, "MAIL_SSL_TLS", False)
+    monkeypatch.setattr(settings, "USE_CREDENTIALS", False)
+    yield handler
+    controller.stop()
+
+
+job_ids = itertools.count(1)
+
+
+def make_job(recipient: str, attempts: int = 1) -> EmailJob:
+    """Письмо, уже взятое воркером в аренду"""
+    return EmailJob(
+        id=next(job_ids),
+        recipient=recipient,
+        subject="У вас взаимная симпатия!",
+        body="Вы понравились Ивану!",
+        status=EmailStatusEnum.pending,
+        attempts=attempts,
+        next_attempt_at=datetime.now(timezone.utc),
+        locked_until=datetime.now(timezone.utc) + timedelta(minutes=5),
+    )
+
+
+class FakeResult:
+    def __init__(self, jobs):
+        self.jobs = jobs
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.jobs
+
+
+class FakeSession:
+    """Сессия, которая возвращает заданные письма при взятии в аренду"""
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.commits = 0
+
+    async def execute(self, statement, **kwargs):
+        return FakeResult(self.jobs)
+
+    async def commit(self):
+        self.commits += 1
+
+
+def test_deliver_emails_sends_and_releases_lease(smtp_stub):
+    jobs = [make_job("anna@example.com"), make_job("boris@example.com")]
+    smtp = SMTPConnection()
+
+    async def run():
+        try:
+            await deliver_emails(jobs, smtp)
+        finally:
+            await smtp.close()
+
+    asyncio.run(run())
+
+    assert [message.rcpt_tos for message in smtp_stub.messages] == [
+        ["anna@example.com"],
+        ["boris@example.com"],
+    ]
+    assert all(job.status == EmailStatusEnum.sent for job in jobs)
+    assert all(job.sent_at is not None for job in jobs)
+    assert all(job.locked_until is None for job in jobs)
+
+
+def test_deliver_emails_retries_rejected_recipient(smtp_stub):
+    rejected = make_job("bounce@example.com")
+    exhausted = make_job("bounce@example.org", attempts=settings.EMAIL_MAX_ATTEMPTS)
+    delivered = make_job("anna@example.com")
+    started = datetime.now(timezone.utc)
+    smtp = SMTPConnection()
+
+    async def run():
+        try:
+            await deliver_emails([rejected, exhausted, delivered], smtp)
+        finally:
+            await smtp.close()
+
+    asyncio.run(run())
+
+    assert rejected.status == EmailStatusEnum.pending
+    assert rejected.last_error
+    assert rejected.next_attempt_at >= started + timedelta(
+        seconds=settings.EMAIL_RETRY_DELAY
+    )
+    assert exhausted.status == EmailStatusEnum.failed
+    assert delivered.status == EmailStatusEnum.sent
+    assert all(job.locked_until is None for job in (rejected, exhausted, delivered))
+    assert [message.rcpt_tos for message in smtp_stub.messages] == [
+        ["anna@example.com"]
+    ]
+
+
+def test_send_pending_emails_commits_claim_before_sending(smtp_stub):
+    session = FakeSession([make_job("anna@example.com")])
+    commits_when_sent = []
+    smtp_stub.on_data = lambda: commits_when_sent.append(session.commits)
+    smtp = SMTPConnection()
+
+    async def run():
+        try:
+            return await send_pending_emails(session, smtp)
+        finally:
+            await smtp.close()
+
+    assert asyncio.run(run()) == 1
+    assert commits_when_sent == [1]
+    assert session.commits == 2
+    assert session.jobs[0].status == EmailStatusEnum.sent